@@ -0,0 +1,87 @@
+"""编码识别基准：对比整页 charset_normalizer 与分级嗅探（BOM/header/meta/记忆/样本检测）的耗时，并校验解码结果
+
+用法: python bench/bench_charset.py [--rounds N] [--chapters N]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+import charset_normalizer  # noqa: E402
+
+# ---- 旧实现：整页统计检测，失败时退回 GB18030 / UTF-8 ----
+
+def legacy_decode(content: bytes) -> str:
+    try:
+        detection = charset_normalizer.from_bytes(content).best()
+        if detection and detection.chaos <= 0.2:
+            return content.decode(detection.encoding, errors="replace")
+    except Exception:
+        pass
+    try:
+        return content.decode("gb18030")
+    except UnicodeDecodeError:
+        return content.decode("utf-8", errors="replace")
+
+# ---- 语料：按章节数放大的小说目录页，分别以 GB18030 / UTF-8 编码，有无声明各一份；
+# script 页在页首放一大段内联脚本，识别样本全是 ASCII ----
+
+def make_page(chapters: int, meta: str, script: bool = False) -> str:
+    rows = "\n".join(f'<dd><a href="/1024/{i}.html">第{i}章 风起云涌，少年踏上修炼之路</a></dd>' for i in range(1, chapters + 1))
+    head = f'<meta charset="{meta}">' if meta else ""
+    if script: head += "<script>" + "var x = 1;\n" * (main.CHARSET_SAMPLE_BYTES // 10) + "</script>"
+    return f"<!DOCTYPE html><html><head>{head}<title>斗破苍穹最新章节_笔趣阁</title></head>" \
+           f"<body><div class=\"listmain\"><dl>{rows}</dl></div></body></html>"
+
+def make_corpus(chapters: int) -> list:
+    corpus = []
+    for encoding, declared in [("gb18030", "gbk"), ("utf-8", "utf-8")]:
+        for label, meta, content_type, script in [
+            ("meta", declared, None, False),
+            ("header", None, f"text/html; charset={declared}", False),
+            ("none", None, "text/html", False),
+            ("script", None, "text/html", True),
+        ]:
+            text = make_page(chapters, meta, script)
+            corpus.append((f"{encoding}/{label}", text, text.encode(encoding), content_type))
+    return corpus
+
+def bench(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run(rounds: int, chapters: int) -> list:
+    results = []
+    print(f"{'page':<18} {'size':>8} {'before':>10} {'cold':>10} {'memo':>10}  ok")
+    for name, text, content, content_type in make_corpus(chapters):
+        host = f"{name}.example"
+        before = bench(lambda: legacy_decode(content), rounds)
+
+        def cold():
+            main.charset_memo.pop(host)
+            return main.decode_content(content, None, content_type, host)
+        after_cold = bench(cold, rounds)
+        main.decode_content(content, None, content_type, host)
+        after_memo = bench(lambda: main.decode_content(content, None, content_type, host), rounds)
+        ok = main.decode_content(content, None, content_type, host) == text
+        print(f"{name:<18} {len(content) // 1024:>6}KB {before:>8.2f}ms {after_cold:>8.2f}ms {after_memo:>8.2f}ms  {'ok' if ok else 'MISMATCH'}")
+        results.append({"name": name, "bytes": len(content), "before_ms": before, "cold_ms": after_cold,
+                        "memo_ms": after_memo, "ok": ok})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=3000)
+    args = parser.parse_args()
+    results = run(args.rounds, args.chapters)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
@@ -0,0 +1,70 @@
+"""参数 p 编解码基准：旧 base62 大整数格式与新的 _0/_1（base64url / deflate）格式的长度与解码耗时
+
+用法: python bench/bench_codec.py [--rounds N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+# ---- 旧实现：逐字符 index 查找 + 大数乘法 ----
+
+def legacy_decode_base62(s: str) -> int:
+    base = len(main.BASE62_ALPHABET)
+    num = 0
+    for char in s:
+        num = num * base + main.BASE62_ALPHABET.index(char)
+    return num
+
+def legacy_decode_params(p: str) -> dict:
+    num = legacy_decode_base62(p)
+    return json.loads(num.to_bytes((num.bit_length() + 7) // 8, 'big').decode('utf-8'))
+
+def legacy_encode_params(params: dict) -> str:
+    # 与 webroot/index.html 旧编码器一致：JSON.stringify 的 UTF-8 字节作为大整数
+    raw = json.dumps(params, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return main.encode_base62(int.from_bytes(raw, 'big'))
+
+def make_params(selectors: int) -> dict:
+    a = ", ".join(f".listmain dl dd:nth-child({i}) > a[href$='.html']" for i in range(selectors))
+    t = ", ".join(f"#list-{i} .chapter-title span" for i in range(selectors))
+    return {"url": "https://www.biquge.example/book/1024/", "a": a, "t": t, "code": "test",
+            "charset": "gbk", "novel": True, "clean": True}
+
+def bench(fn, arg, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+def run(rounds: int) -> list:
+    results = []
+    print(f"{'selectors':>9} {'legacy len':>10} {'new len':>8} {'legacy decode':>14} {'d&c decode':>11} {'_1 decode':>10}  ok")
+    for selectors in (1, 10, 50, 200, 500):
+        params = make_params(selectors)
+        legacy_p = legacy_encode_params(params)
+        new_p = main.encode_params(params)
+        ok = legacy_decode_params(legacy_p) == main.decode_params(legacy_p) == main.decode_params(new_p) == params
+        before = bench(legacy_decode_params, legacy_p, rounds)
+        dc = bench(main.decode_params, legacy_p, rounds)
+        after = bench(main.decode_params, new_p, rounds)
+        print(f"{selectors:>9} {len(legacy_p):>10} {len(new_p):>8} {before:>12.1f}us {dc:>9.1f}us {after:>8.1f}us  {'ok' if ok else 'MISMATCH'}")
+        results.append({"selectors": selectors, "legacy_len": len(legacy_p), "new_len": len(new_p),
+                        "legacy_decode_us": before, "dc_decode_us": dc, "new_decode_us": after, "ok": ok})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    results = run(args.rounds)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
@@ -0,0 +1,99 @@
+"""规则识别基准：对比旧的 BeautifulSoup 实现与单次遍历 + 提前结束的实现，并校验识别出的规则一致
+
+用法: python bench/bench_detect.py [--rounds N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from bs4 import BeautifulSoup  # noqa: E402
+
+# ---- 旧实现 ----
+
+def legacy_detect(html_content: str) -> dict:
+    soup = BeautifulSoup(html_content, 'lxml')
+    all_links = soup.find_all('a', href=True)
+    if not all_links:
+        soup = BeautifulSoup(html_content, 'html.parser')
+        all_links = soup.find_all('a', href=True)
+    if not all_links:
+        return {"error": "No links found on the page. Site might be blocking requests or requires JavaScript."}
+    if soup.select('a[href^="magnet:"]'):
+        return {"a": 'a[href^="magnet:"]', "t": "a[href^='magnet:']", "attr": "href", "message": "Detected media links."}
+    content_patterns = [r'第.*?[章节节回集话卷]', r'Chapter', r'分卷', r'番外', r'正文', r'BD', r'HD', r'720p', r'1080p', r'迅雷下载', r'磁力下载']
+    novel_links = [l for l in all_links if any(re.search(p, l.get_text(strip=True), re.I) for p in content_patterns)]
+    if len(novel_links) > 1:
+        parents = Counter()
+        for l in novel_links[:100]:
+            p = l.parent
+            if not p: continue
+            classes = p.get('class')
+            parents[p.name + (f"#{p.get('id')}" if p.get('id') else "") + (f".{'.'.join(classes)}" if classes else "")] += 1
+        best_parent = parents.most_common(1)[0][0]
+        if parents.most_common(1)[0][1] < 5 and len(novel_links) > 20:
+            best_parent = "a"
+        rule = f"{best_parent} a" if best_parent != "a" else "a"
+        return {"a": rule, "t": rule, "attr": "href", "novel": True,
+                "message": f"Detected novel pattern with {len(novel_links)} items."}
+    return {"error": "Could not detect patterns. Found " + str(len(all_links)) + " total links, but none match content patterns."}
+
+# ---- 语料 ----
+
+def directory_page(links: int) -> str:
+    # 大型目录页：导航、分卷目录、大量章节链接与页脚链接
+    nav = "".join(f'<a href="/sort/{i}/">分类{i}</a>' for i in range(30))
+    volumes = "".join(f'<li><a href="/vol/{i}/">第{i}卷</a></li>' for i in range(1, 8))
+    chapters = "".join(f'<dd><a href="/book/{i}.html">第{i}章 风起云涌</a></dd>' for i in range(1, links + 1))
+    footer = "".join(f'<a href="/link/{i}">友情链接{i}</a>' for i in range(50))
+    return f'<html><head><title>目录</title></head><body><div class="nav">{nav}</div><ul class="vols">{volumes}</ul>' \
+           f'<div id="list"><dl>{chapters}</dl></div><div class="footer">{footer}</div></body></html>'
+
+def corpus() -> list:
+    pages = []
+    for name in ["novel_index.html", "magnet_list.html", "blog_list.html", "book/index.html", "magnet/list.html"]:
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+            pages.append((name, f.read()))
+    with open(os.path.join(FIXTURES, "gbk", "index.html"), encoding="gbk") as f:
+        pages.append(("gbk/index.html", f.read()))
+    for links in (1000, 10000, 30000):
+        pages.append((f"directory {links} links", directory_page(links)))
+    pages.append(("no links", "<html><body><p>nothing here</p></body></html>"))
+    return pages
+
+def bench(fn, html: str, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run(rounds: int) -> list:
+    results = []
+    for name, html in corpus():
+        old = legacy_detect(html)
+        new = main.detect_from_html(html, name)
+        keys = ("a", "t", "attr", "novel", "error")
+        ok = {k: old.get(k) for k in keys if k != "error"} == {k: new.get(k) for k in keys if k != "error"} \
+            and ("error" in old) == ("error" in new)
+        before = bench(legacy_detect, html, rounds)
+        after = bench(lambda h: main.detect_from_html(h, name), html, rounds)
+        print(f"{name:<24} {before:>9.2f}ms -> {after:>8.2f}ms ({before / after:5.1f}x)  {new.get('a') or new.get('error')!r:<28} {'ok' if ok else 'MISMATCH'}")
+        results.append({"name": name, "before_ms": before, "after_ms": after, "ok": ok})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    results = run(args.rounds)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
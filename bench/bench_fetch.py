@@ -0,0 +1,65 @@
+"""抓取内存基准：对比整体读取（原始字节 + 解码文本同时驻留）与流式解码、提前结束下载的单次请求峰值内存
+
+用法: python bench/bench_fetch.py [--chapters N]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from bench.upstream import serve  # noqa: E402
+
+def make_page(chapters: int) -> bytes:
+    # 目录在前，大段推荐/评论区在后，模拟只需要页面前部的列表页
+    rows = "\n".join(f'<dd><a href="/1024/{i}.html">第{i}章 风起云涌，少年踏上修炼之路</a></dd>' for i in range(1, 201))
+    tail = "\n".join(f'<div class="comment">书友{i}：这本书写得真好，强烈推荐给大家，每天都在追更新。</div>' for i in range(chapters))
+    html = f'<!DOCTYPE html><html><head><meta charset="gbk"><title>斗破苍穹</title></head>' \
+           f'<body><div class="listmain"><dl>{rows}</dl></div>{tail}</body></html>'
+    return html.encode("gb18030")
+
+# ---- 旧实现：整体读取响应，原始字节与解码文本一起返回 ----
+
+async def legacy_fetch(url: str):
+    response = await main.get_http_client().get(url)
+    content = response.content
+    return main.decode_content(content), content
+
+async def measure(label: str, fetch) -> dict:
+    main.upstream_cache.memory = main.LRUCache(main.UPSTREAM_CACHE_MAX_BYTES)
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await fetch()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    text = result[0] if isinstance(result, tuple) else result
+    print(f"{label:<22} peak {peak / 1024 / 1024:7.2f}MB  {elapsed * 1000:8.1f}ms  text {len(text):>9} chars")
+    return {"name": label, "peak_bytes": peak, "ms": elapsed * 1000, "chars": len(text)}
+
+async def run(chapters: int) -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "index.html"), "wb") as f:
+            f.write(make_page(chapters))
+        url = f"http://127.0.0.1:{serve(directory)}/index.html"
+        print(f"page size {os.path.getsize(os.path.join(directory, 'index.html')) / 1024 / 1024:.2f}MB")
+        async with main.lifespan(main.app):
+            await legacy_fetch(url)  # 预热连接
+            return [
+                await measure("before (get + decode)", lambda: legacy_fetch(url)),
+                await measure("streaming decode", lambda: main.fetch_html_raw(url)),
+                await measure("streaming + until", lambda: main.fetch_html_raw(url, until="</dl>")),
+            ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chapters", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(run(args.chapters))
@@ -0,0 +1,93 @@
+"""小说目录增量处理基准：每次轮询都完整处理目录（关闭记忆）与按 feed 记忆规范化结果两种方式的提取耗时，
+场景为首次构建、目录未变、目录末尾新增章节；同时对比截取最新章节前后的生成耗时，并校验两种方式结果一致，
+以及中文数字标题的目录（bench/fixtures/book/index.html）截取后仍包含最新章节
+
+用法: python bench/bench_novel.py [--chapters 5000] [--rounds 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+def index_page(chapters: int) -> str:
+    rows = "".join(f'<dd><a href="/book/{i}.html"> 第{i}章  风起云涌 </a></dd>' for i in range(1, chapters + 1))
+    return f'<html><head><title>斗破苍穹</title></head><body><div class="listmain"><dl>{rows}</dl></div></body></html>'
+
+def timed(fn, rounds: int):
+    best, result = float("inf"), None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+def run(chapters: int, rounds: int) -> bool:
+    params = main.parse_feed_params({"url": "https://www.biquge.example/book/", "a": ".listmain dd a",
+                                     "code": main.VERIFICATION_CODE, "novel": True})
+    pages = [("first build", index_page(chapters)), ("unchanged", index_page(chapters)),
+             ("+1 chapter", index_page(chapters + 1)), ("+20 chapters", index_page(chapters + 21))]
+    memo = main.LRUCache(main.novel_memo.max_bytes)
+    window = main.NOVEL_RECENT_ITEMS or 200
+    main.NOVEL_RECENT_ITEMS = 0
+    ok = True
+    print(f"{chapters} chapters, extract_feed on a parsed tree (best of {rounds}):")
+    for name, html in pages:
+        page: dict = {}
+        main.select_nodes_lxml(html, params, page)
+        main.novel_memo = main.LRUCache(0)
+        before, expected = timed(lambda: main.extract_feed(html, params, "", page=page), rounds)
+        # 每轮先恢复到上一次轮询后的记忆，只测这一次轮询
+        main.novel_memo = memo
+        snapshot = dict(memo._data)
+        def poll():
+            memo._data.clear()
+            memo._data.update(snapshot)
+            return main.extract_feed(html, params, "", page=page)
+        after, actual = timed(poll, rounds)
+        same = actual == expected
+        ok = ok and same
+        print(f"  {name:<14} full {before:8.2f}ms  incremental {after:8.2f}ms ({before / after:5.1f}x)  {'ok' if same else 'MISMATCH'}")
+
+    items = expected['items']
+    dates = [time.time()] * len(items)
+    full, _ = timed(lambda: main.render_feed("t", params['url'], items, dates), rounds)
+    recent, _ = timed(lambda: main.render_feed("t", params['url'], items[:window], dates[:window]), rounds)
+    print(f"render_feed: all {len(items)} items {full:8.2f}ms -> recent {min(window, len(items))} items {recent:6.2f}ms")
+    return ok
+
+def check_recent_window(window: int = 200) -> bool:
+    """中文数字标题按字符排序并不反映章节先后，截取窗口必须按目录顺序取，最新的章节不能被截掉"""
+    with open(os.path.join(FIXTURES, "book", "index.html"), encoding="utf-8") as f:
+        html = f.read()
+    params = main.parse_feed_params({"url": "https://www.biquge.example/book/", "a": ".listmain dd a",
+                                     "code": main.VERIFICATION_CODE, "novel": True})
+    saved, main.NOVEL_RECENT_ITEMS = main.NOVEL_RECENT_ITEMS, window
+    ok = True
+    try:
+        for engine in ("lxml", "bs4"):
+            main.novel_memo = main.LRUCache(0)
+            links = {item['link'] for item in main.extract_feed(html, params, "", engine=engine)['items']}
+            expected = {f"https://www.biquge.example/book/{n}.html" for n in range(1501 - window, 1501)}
+            same = links == expected
+            ok = ok and same
+            print(f"recent {window} of a Chinese-numeral index ({engine}): {'ok' if same else 'MISMATCH'}"
+                  f"{'' if same else f' missing {sorted(expected - links)[:5]}'}")
+    finally:
+        main.NOVEL_RECENT_ITEMS = saved
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chapters", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    ok = run(args.chapters, args.rounds)
+    ok = check_recent_window() and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,183 @@
+"""规则处理的微基准：对比预编译正则/选择器缓存前后的单条耗时，并校验输出一致
+
+用法: python bench/bench_rules.py [--rounds N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from bs4 import BeautifulSoup  # noqa: E402
+import lxml.html  # noqa: E402
+from lxml.cssselect import CSSSelector  # noqa: E402
+
+# ---- 旧实现（每次调用时解析正则/选择器），仅用于对比 ----
+
+LEGACY_JUNK_PATTERNS = [
+    r'上一[章页]', r'下一[章页]', r'目[录次]', r'书[架签]', r'加入书', r'推荐本', r'收藏本',
+    r'选择背景', r'选择字体', r'font[a-z0-9]+', r'繁體', r'阅读[器网]', r'投推荐', r'返回',
+    r'快捷键', r'Ctrl', r'所有文字', r'由网友', r'本站立场', r'Copyright', r'All rights',
+    r'read[0-9]*\(\);', r'javascript', r'www\.', r'http', r'\.com', r'\.net', r'温馨提示',
+    r'章节错误', r'点此举报', r'重要声明', r'不得转载', r'手机版', r'客户端'
+]
+
+def legacy_process_pure_content(text: str) -> str:
+    if not text: return ""
+    text = re.sub(r'[\t ]{2,}', '\n', text)
+    text = re.sub(r'\|', '\n', text)
+    clean_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line or len(line) < 2: continue
+        hit_count = sum(1 for p in LEGACY_JUNK_PATTERNS if re.search(p, line, re.I))
+        if hit_count >= 2: continue
+        if hit_count >= 1 and len(line) < 45: continue
+        if re.search(r'©|20\d{2}', line): continue
+        if re.match(r'^[_\-\s\*]+$', line): continue
+        line = re.sub(r'[\s　\xa0]+', ' ', line).strip()
+        if line:
+            clean_lines.append(f"<p>{line}</p>")
+    return "".join(clean_lines)
+
+def legacy_format_episode_title(title: str, season) -> str:
+    if season is None: return title
+    match = re.search(r'第\s*(\d+)\s*[集话期P]', title)
+    if not match:
+        match = re.search(r'(?:[\s\-\[\]\(_]|^)(\d+)(?:v\d+)?(?:[\s\-\[\]\)_]|$|\.[a-z0-9]{2,4})', title, re.I)
+    if not match:
+        match = re.search(r'(\d+)(?:v\d+)?(?:\.[a-z0-9]{2,4})?$', title, re.I)
+    if match:
+        try:
+            ep_num = int(match.group(1))
+            s_str = f"S{int(season):02d}E{ep_num:02d}"
+            replace_match = re.search(r'(\d+)(?:v\d+)?', match.group(0), re.I)
+            if replace_match:
+                to_replace = replace_match.group(0)
+                start_in_title = title.find(to_replace, match.start())
+                if start_in_title != -1:
+                    new_title = title[:start_in_title] + s_str + title[start_in_title+len(to_replace):]
+                else:
+                    new_title = f"{title} {s_str}"
+            else:
+                new_title = f"{title} {s_str}"
+            full_match = match.group(0)
+            if "第" in full_match or any(k in full_match for k in ["集", "话", "P"]):
+                new_title = title.replace(full_match, f" {s_str} ")
+            return re.sub(r'\s+', ' ', new_title).strip()
+        except:
+            pass
+    return title
+
+def legacy_natural_sort_key(text: str) -> list:
+    clean_text = re.sub(r'[\s　\xa0]+', '', text)
+    return [int(c) if c.isdigit() else c.lower() for c in re.split(r'(\d+)', clean_text) if c]
+
+def legacy_novel_title(title: str):
+    if not re.search(r'第.*?[章节节回集话卷]|Chapter\s*\d+|^\d+[\s\.]+', title, re.I):
+        return None
+    title = re.sub(r'[\s　\xa0]+', '', title)
+    title = re.sub(r'(第.*?[章节节回集话卷])', r'\1 ', title)
+    title = re.sub(r'(Chapter\d+)', r'\1 ', title, flags=re.I)
+    return title.strip()
+
+def current_novel_title(title: str):
+    if not main._NOVEL_CHAPTER_RE.search(title):
+        return None
+    title = main._WHITESPACE_RE.sub('', title)
+    title = main._NOVEL_KEYWORD_RE.sub(r'\1 ', title)
+    title = main._NOVEL_CHAPTER_EN_RE.sub(r'\1 ', title)
+    return title.strip()
+
+def legacy_select(tree, selectors: str) -> list:
+    nodes = []
+    for sel in [s.strip() for s in selectors.split(',')]:
+        nodes.extend(CSSSelector(sel, translator='html')(tree))
+    return nodes
+
+def current_select(tree, selectors: str) -> list:
+    nodes = []
+    for sel in main.split_selectors(selectors):
+        nodes.extend(main.compile_css(sel)(tree))
+    return nodes
+
+def legacy_soup_select(soup, selectors: str) -> list:
+    nodes = []
+    for sel in [s.strip() for s in selectors.split(',')]:
+        nodes.extend(soup.select(sel))
+    return nodes
+
+def current_soup_select(soup, selectors: str) -> list:
+    nodes = []
+    for sel in main.split_selectors(selectors):
+        nodes.extend(main.compile_soup_css(sel).select(soup))
+    return nodes
+
+# ---- 测试数据 ----
+
+def make_content(rnd: random.Random, lines: int) -> str:
+    junk = ["上一章 | 目录 | 下一章", "加入书签 推荐本书", "www.biquge.com 手机版", "Copyright 2024 All rights reserved",
+            "温馨提示：按 Ctrl+D 收藏本站", "read3();", "章节错误，点此举报", "————————"]
+    body = "他抬起头，看向远处的山峰，心中涌起一股难以言喻的情绪，仿佛有什么东西正在苏醒。"
+    out = []
+    for i in range(lines):
+        out.append(rnd.choice(junk) if rnd.random() < 0.2 else body[: rnd.randint(10, len(body))] + f"（{i}）")
+    return "\n".join(out)
+
+def make_titles(rnd: random.Random, n: int) -> list:
+    forms = ["[Sub] Show - {n:02d} [1080p].mkv", "Show 第{n}集 [720p]", "Show_{n}v2.mp4", "Show.E{n}.END",
+             "第{n}章 　风起云涌", "Chapter {n} The Return", "{n}. 序幕", "番外 {n}"]
+    return [rnd.choice(forms).format(n=rnd.randint(1, 2000)) for _ in range(n)]
+
+def bench(label: str, fn, items: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    per_item = best / len(items) * 1e6
+    print(f"  {label:<8} {per_item:9.2f} us/item")
+    return per_item
+
+def compare(name: str, legacy, current, items: list, rounds: int) -> dict:
+    mismatches = sum(1 for item in items if legacy(item) != current(item))
+    print(f"{name} ({len(items)} items, {mismatches} mismatches)")
+    before = bench("before", legacy, items, rounds)
+    after = bench("after", current, items, rounds)
+    print(f"  speedup  {before / after:9.2f}x")
+    return {"name": name, "before_us": before, "after_us": after, "mismatches": mismatches}
+
+def run(rounds: int) -> list:
+    rnd = random.Random(42)
+    contents = [make_content(rnd, 60) for _ in range(50)]
+    titles = make_titles(rnd, 2000)
+    with open(os.path.join(ROOT, "bench", "fixtures", "novel_index.html"), encoding="utf-8") as f:
+        page = f.read()
+    tree = lxml.html.document_fromstring(page)
+    soup = BeautifulSoup(page, "lxml")
+    selectors = [".listmain dd a, #info a", "dl > dd a", "dt + dd a, .header a"] * 20
+    return [
+        compare("process_pure_content", legacy_process_pure_content, main.process_pure_content, contents, rounds),
+        compare("format_episode_title", lambda t: legacy_format_episode_title(t, 1),
+                lambda t: main.format_episode_title(t, 1), titles, rounds),
+        compare("natural_sort_key", legacy_natural_sort_key, main.natural_sort_key, titles, rounds),
+        compare("novel title pipeline", legacy_novel_title, current_novel_title, titles, rounds),
+        compare("lxml selectors", lambda s: len(legacy_select(tree, s)), lambda s: len(current_select(tree, s)),
+                selectors, rounds),
+        compare("bs4 selectors", lambda s: len(legacy_soup_select(soup, s)), lambda s: len(current_soup_select(soup, s)),
+                selectors, rounds),
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    results = run(args.rounds)
+    sys.exit(1 if any(r["mismatches"] for r in results) else 0)
@@ -0,0 +1,105 @@
+"""冷启动基准：导入耗时、进程启动到可以响应的时间，以及首个 /html2rss 请求与稳态请求的耗时
+
+用法: python bench/bench_startup.py [--rounds 5] [--ref HEAD~1]
+
+每一轮都启动全新的解释器；--ref 另外测量指定提交中的 main.py 作为对比。
+"""
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+from bench.upstream import serve  # noqa: E402
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def checkout(ref: str, directory: str) -> str:
+    """把指定提交的 main.py 与 webroot 放到临时目录"""
+    os.makedirs(directory)
+    source = subprocess.run(["git", "show", f"{ref}:main.py"], cwd=ROOT, capture_output=True, check=True).stdout
+    with open(os.path.join(directory, "main.py"), "wb") as f:
+        f.write(source)
+    shutil.copytree(os.path.join(ROOT, "webroot"), os.path.join(directory, "webroot"))
+    return directory
+
+def env_for(directory: str, warmup: bool) -> dict:
+    # directory 为临时目录，条目历史等数据写在这里
+    return dict(os.environ, WARMUP="1" if warmup else "0", FEED_SCHEDULER="0", HOST_RATE="0",
+                UPSTREAM_CACHE_MAX_BYTES="0", FEED_CACHE_MAX_BYTES="0", VERIFICATION_CODE="test",
+                ITEM_HISTORY_DB=os.path.join(directory, "items.db"))
+
+def measure_import(tree: str, env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=tree, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def measure_server(tree: str, env: dict, launch: list, feed_url: str) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, *launch, "--port", str(port)], cwd=tree, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            while True:
+                try:
+                    client.get("/stats", params={"code": "test"})
+                    break
+                except httpx.TransportError:
+                    if proc.poll() is not None: raise RuntimeError("server exited during startup")
+                    time.sleep(0.005)
+            ready = time.perf_counter() - started
+            params = {"url": feed_url, "a": "td a.dl", "t": "td.name a", "season": "1", "code": "test"}
+            t = time.perf_counter()
+            assert client.get("/html2rss", params=params).status_code == 200
+            first = time.perf_counter() - t
+            t = time.perf_counter()
+            assert client.get("/html2rss", params=params).status_code == 200
+            steady = time.perf_counter() - t
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {"ready_ms": ready * 1000, "first_ms": first * 1000, "steady_ms": steady * 1000,
+            "first_feed_ms": (ready + first) * 1000}
+
+def run_case(name: str, tree: str, warmup: bool, launch: list, feed_url: str, rounds: int) -> dict:
+    env = env_for(tempfile.mkdtemp(), warmup)
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "main.py"], cwd=tree, env=env, check=True)
+    imports = [measure_import(tree, env) for _ in range(rounds)]
+    servers = [measure_server(tree, env, launch, feed_url) for _ in range(rounds)]
+    result = {"name": name, "import_ms": statistics.median(imports)}
+    for key in ("ready_ms", "first_ms", "steady_ms", "first_feed_ms"):
+        result[key] = statistics.median(s[key] for s in servers)
+    print(f"{name:<32} import {result['import_ms']:7.1f}ms  ready {result['ready_ms']:7.1f}ms  "
+          f"first request {result['first_ms']:7.1f}ms  steady {result['steady_ms']:6.1f}ms  "
+          f"spawn->first feed {result['first_feed_ms']:7.1f}ms")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--ref", help="对比的提交，例如 HEAD~1")
+    args = parser.parse_args()
+
+    feed_url = f"http://127.0.0.1:{serve(FIXTURES)}/magnet/list.html"
+    print(f"median of {args.rounds} fresh interpreters:")
+    with tempfile.TemporaryDirectory() as directory:
+        if args.ref:
+            old = checkout(args.ref, os.path.join(directory, "ref"))
+            run_case(f"{args.ref} (python main.py)", old, False, ["main.py"], feed_url, args.rounds)
+        run_case("python main.py", ROOT, False, ["main.py"], feed_url, args.rounds)
+        run_case("python -m main", ROOT, False, ["-m", "main"], feed_url, args.rounds)
+        run_case("python -m main, WARMUP=1", ROOT, True, ["-m", "main"], feed_url, args.rounds)
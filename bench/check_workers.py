@@ -0,0 +1,86 @@
+"""多进程模式校验：以 --workers N 启动服务，对同一个 feed 发起并发请求，确认各 worker 通过共享后端
+只向上游抓取一次且返回一致的结果；同时报告冷启动与并发吞吐
+
+用法: python bench/check_workers.py [--workers 3] [--requests 48] [--backend sqlite,redis]
+
+redis 后端默认使用 bench/fake_redis.py 替身，--redis-url 可指向真实的 Redis。
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+from bench import fake_redis, upstream  # noqa: E402
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers: int, shared: str, directory: str) -> tuple:
+    port = free_port()
+    env = dict(os.environ, SHARED_CACHE=shared, ITEM_HISTORY_DB=os.path.join(directory, "items.db"),
+               FEED_SCHEDULER="0", HOST_RATE="0", VERIFICATION_CODE="test")
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "main.py", "--workers", str(workers), "--port", str(port)],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats?code=test", timeout=1)
+            return proc, port, time.perf_counter() - started
+        except httpx.TransportError:
+            if proc.poll() is not None: raise RuntimeError("server exited during startup")
+            time.sleep(0.05)
+
+async def burst(port: int, url: str, total: int) -> list:
+    # 不复用连接，让请求分散到各个 worker
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        params = {"url": url, "a": ".listmain dd a", "novel": "true", "code": "test"}
+        return await asyncio.gather(*[client.get("/html2rss", params=params) for _ in range(total)])
+
+def check(name: str, shared: str, args, upstream_url: str) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        shared = shared.replace("{tmp}", directory)
+        proc, port, startup = start_server(args.workers, shared, directory)
+        try:
+            upstream.REQUESTS.clear()
+            start = time.perf_counter()
+            responses = asyncio.run(burst(port, f"{upstream_url}/book/index.html", args.requests))
+            wall = time.perf_counter() - start
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+    statuses = {r.status_code for r in responses}
+    etags = {r.headers.get("etag") for r in responses}
+    fetches = upstream.REQUESTS["/book/index.html"]
+    ok = statuses == {200} and len(etags) == 1 and fetches == 1 and proc.returncode in (0, -signal.SIGTERM)
+    print(f"{name:<8} startup {startup * 1000:7.0f}ms  {args.requests} requests in {wall * 1000:7.0f}ms  "
+          f"upstream fetches {fetches}  statuses {sorted(statuses)}  etags {len(etags)}  exit {proc.returncode}  "
+          f"{'ok' if ok else 'FAILED'}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=48)
+    parser.add_argument("--latency", type=float, default=300, help="上游延迟（毫秒），保证请求在抓取完成前到达")
+    parser.add_argument("--backend", default="sqlite,redis")
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{upstream.serve(FIXTURES, args.latency)}"
+    backends = {"sqlite": "sqlite:///{tmp}/shared.db",
+                "redis": args.redis_url or f"redis://127.0.0.1:{fake_redis.serve()}/0"}
+    results = [check(name, backends[name], args, upstream_url) for name in args.backend.split(",")]
+    sys.exit(0 if all(results) else 1)
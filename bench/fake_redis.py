@@ -0,0 +1,90 @@
+"""本地 Redis 替身：asyncio 实现的 RESP2 服务，支持 PING/AUTH/SELECT/GET/SET（EX/PX/NX/XX）/DEL/FLUSHDB/DBSIZE，
+用于在没有 Redis 的环境下验证 SHARED_CACHE=redis://
+
+用法: python bench/fake_redis.py [--port 6379]
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}  # key -> (value, 过期时间或 None)
+
+    def _alive(self, key: bytes):
+        item = self.data.get(key)
+        if item and item[1] is not None and item[1] <= time.monotonic():
+            del self.data[key]
+            item = None
+        return item
+
+    def execute(self, args: list):
+        name = args[0].upper()
+        if name == b"PING": return "+PONG"
+        if name in (b"AUTH", b"SELECT"): return "+OK"
+        if name == b"GET":
+            item = self._alive(args[1])
+            return item[0] if item else None
+        if name == b"SET":
+            key, value, expires, options = args[1], args[2], None, [a.upper() for a in args[3:]]
+            if b"EX" in options: expires = time.monotonic() + int(options[options.index(b"EX") + 1])
+            if b"PX" in options: expires = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+            exists = self._alive(key) is not None
+            if (b"NX" in options and exists) or (b"XX" in options and not exists): return None
+            self.data[key] = (value, expires)
+            return "+OK"
+        if name == b"DEL": return sum(self.data.pop(key, None) is not None for key in args[1:])
+        if name == b"FLUSHDB":
+            self.data.clear()
+            return "+OK"
+        if name == b"DBSIZE": return len(self.data)
+        return f"-ERR unknown command '{name.decode()}'"
+
+    @staticmethod
+    def encode(reply) -> bytes:
+        if reply is None: return b"$-1\r\n"
+        if isinstance(reply, int): return b":%d\r\n" % reply
+        if isinstance(reply, str): return reply.encode() + b"\r\n"
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                args = []
+                for _ in range(int(line[1:-2])):
+                    size = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                writer.write(self.encode(self.execute(args)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def serve(port: int = 0) -> int:
+    """在后台线程中启动服务并返回端口"""
+    ready = threading.Event()
+    result = {}
+
+    async def run():
+        server = await asyncio.start_server(FakeRedis().handle, "127.0.0.1", port)
+        result["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(run()), daemon=True).start()
+    ready.wait()
+    return result["port"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    async def main():
+        server = await asyncio.start_server(FakeRedis().handle, "127.0.0.1", args.port)
+        print(f"fake redis listening on 127.0.0.1:{args.port}")
+        await server.serve_forever()
+    asyncio.run(main())
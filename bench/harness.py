@@ -0,0 +1,211 @@
+"""端到端基准：用本地上游替身提供 fixtures 中的页面，在并发下测 /html2rss、/read、/detect 的吞吐与 p50/p99，
+并对热点函数做微基准；结果可写成 JSON，与其他提交的结果对比
+
+用法:
+  python bench/harness.py [--concurrency 8] [--requests 200] [--latency 20] [--warm] [--only html2rss,read,detect,micro]
+                          [--output result.json] [--compare baseline.json]
+
+默认关闭各级缓存、小说目录增量记忆、并发请求合并（SINGLE_FLIGHT=0）、后台调度、预取与主机限速，
+每个请求都完整走一遍抓取与解析；--warm 则保留缓存、增量记忆与请求合并。
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--latency", type=float, default=20, help="上游延迟（毫秒）")
+    parser.add_argument("--warm", action="store_true", help="保留上游/feed/阅读页缓存、小说目录增量记忆与并发请求合并")
+    parser.add_argument("--rounds", type=int, default=5, help="微基准轮数（取最优）")
+    parser.add_argument("--only", default="html2rss,read,detect,micro")
+    parser.add_argument("--output", help="结果 JSON 的写入路径")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    return parser.parse_args()
+
+ARGS = parse_args()
+
+# 必须在导入 main 之前设置，已在环境中显式设置的值优先
+os.environ.setdefault("HOST_RATE", "0")
+os.environ.setdefault("HTTP_MAX_PER_HOST", "64")
+os.environ.setdefault("FEED_SCHEDULER", "0")
+os.environ.setdefault("READ_PREFETCH_DEPTH", "0")
+os.environ.setdefault("ITEM_HISTORY_DB", os.path.join(tempfile.mkdtemp(), "items.db"))
+if not ARGS.warm:
+    for name in ("UPSTREAM_CACHE_MAX_BYTES", "FEED_CACHE_MAX_BYTES", "READ_CACHE_MAX_BYTES", "NOVEL_MEMO_MAX_BYTES",
+                 "SINGLE_FLIGHT"):
+        os.environ.setdefault(name, "0")
+
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+import lxml.html  # noqa: E402
+import main  # noqa: E402
+from bench.upstream import serve  # noqa: E402
+
+CONFIG_KEYS = ["HOST_RATE", "HTTP_MAX_PER_HOST", "FEED_SCHEDULER", "READ_PREFETCH_DEPTH", "UPSTREAM_CACHE_MAX_BYTES",
+               "FEED_CACHE_MAX_BYTES", "READ_CACHE_MAX_BYTES", "NOVEL_MEMO_MAX_BYTES", "SINGLE_FLIGHT", "PARSE_POOL",
+               "PARSE_WORKERS", "FEED_ENGINE", "READ_PAGINATION"]
+
+def scenarios(upstream: str) -> list:
+    """(名称, 分组, 路径, 查询参数, 结果校验)"""
+    def feed(**params):
+        return {"code": main.VERIFICATION_CODE, **params}
+    def is_rss(r): return r.status_code == 200 and b"<item>" in r.content
+    def is_chapter(r): return r.status_code == 200 and "（1-3-" in r.text
+    def is_rule(r): return r.status_code == 200 and "error" not in r.json()
+    read_url = base64.urlsafe_b64encode(f"{upstream}/book/1.html".encode()).decode().rstrip("=")
+    return [
+        ("html2rss novel index", "html2rss", "/html2rss",
+         feed(url=f"{upstream}/book/index.html", a=".listmain dd a", novel="true"), is_rss),
+        ("html2rss gbk index", "html2rss", "/html2rss",
+         feed(url=f"{upstream}/gbk/index.html", a=".listmain dd a", novel="true"), is_rss),
+        ("html2rss gb18030 no meta", "html2rss", "/html2rss",
+         feed(url=f"{upstream}/gbk/nometa.html", a=".listmain dd a", novel="true"), is_rss),
+        ("html2rss magnet list", "html2rss", "/html2rss",
+         feed(url=f"{upstream}/magnet/list.html", a="td a.dl", t="td.name a", season="1"), is_rss),
+        ("read paginated chapter", "read", "/read", {"url": read_url, "code": main.VERIFICATION_CODE}, is_chapter),
+        ("detect novel index", "detect", "/detect", {"url": f"{upstream}/book/index.html", "code": main.VERIFICATION_CODE}, is_rule),
+        ("detect magnet list", "detect", "/detect", {"url": f"{upstream}/magnet/list.html", "code": main.VERIFICATION_CODE}, is_rule),
+    ]
+
+def percentile(sorted_values: list, pct: float) -> float:
+    # nearest-rank
+    if not sorted_values: return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+async def load(client: httpx.AsyncClient, name: str, path: str, params: dict, check, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                ok = check(response)
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok: errors += 1
+
+    await client.get(path, params=params)  # 预热：建立连接、编译选择器
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - start
+    latencies.sort()
+    result = {
+        "name": name, "requests": total, "concurrency": concurrency, "errors": errors,
+        "rps": round(total / wall, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+    print(f"  {name:<26} {result['rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms  errors {errors}")
+    return result
+
+async def run_load(groups: set) -> list:
+    upstream = f"http://127.0.0.1:{serve(FIXTURES, ARGS.latency)}"
+    results = []
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, group, path, params, check in scenarios(upstream):
+                if group in groups:
+                    results.append(await load(client, name, path, params, check, ARGS.requests, ARGS.concurrency))
+    return results
+
+def best_of(fn, items: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+def run_micro() -> list:
+    with open(os.path.join(FIXTURES, "book", "1.html"), encoding="utf-8") as f:
+        chapter_text = lxml.html.document_fromstring(f.read()).get_element_by_id("content").text_content()
+    with open(os.path.join(FIXTURES, "book", "index.html"), encoding="utf-8") as f:
+        index_titles = [a.text_content() for a in lxml.html.document_fromstring(f.read()).cssselect(".listmain dd a")]
+    with open(os.path.join(FIXTURES, "magnet", "list.html"), encoding="utf-8") as f:
+        episode_titles = [a.text_content() for a in lxml.html.document_fromstring(f.read()).cssselect("td.name a")]
+    items = [{"title": t, "link": f"https://www.biquge.example/book/{i}.html"} for i, t in enumerate(index_titles)]
+    dates = [time.time()] * len(items)
+    cases = [
+        ("render_feed (1509 items)", lambda _: main.render_feed("斗破苍穹", "https://www.biquge.example/", items, dates), [None]),
+        ("process_pure_content (chapter page)", main.process_pure_content, [chapter_text]),
+        ("format_episode_title", lambda t: main.format_episode_title(t, 1), episode_titles),
+        ("natural_sort_key", main.natural_sort_key, index_titles),
+    ]
+    results = []
+    for name, fn, data in cases:
+        us = best_of(fn, data, ARGS.rounds)
+        print(f"  {name:<36} {us:>10.2f} us/op")
+        results.append({"name": name, "us_per_op": round(us, 3)})
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(current: dict, baseline: dict):
+    print(f"\ncompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    old = {r["name"]: r for r in baseline.get("load", [])}
+    for r in current.get("load", []):
+        if r["name"] in old:
+            b = old[r["name"]]
+            print(f"  {r['name']:<26} rps {b['rps']:>8.1f} -> {r['rps']:>8.1f} ({r['rps'] / b['rps'] - 1:+.0%})"
+                  f"  p99 {b['p99_ms']:>8.2f} -> {r['p99_ms']:>8.2f}ms")
+    old = {r["name"]: r for r in baseline.get("micro", [])}
+    for r in current.get("micro", []):
+        if r["name"] in old:
+            b = old[r["name"]]
+            print(f"  {r['name']:<36} {b['us_per_op']:>10.2f} -> {r['us_per_op']:>10.2f} us/op ({r['us_per_op'] / b['us_per_op'] - 1:+.0%})")
+
+def main_() -> int:
+    groups = set(ARGS.only.split(","))
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "concurrency": ARGS.concurrency, "requests": ARGS.requests, "latency_ms": ARGS.latency, "warm": ARGS.warm,
+            "config": {k: os.environ.get(k) for k in CONFIG_KEYS if os.environ.get(k) is not None},
+        },
+    }
+    if groups & {"html2rss", "read", "detect"}:
+        print(f"load (concurrency {ARGS.concurrency}, {ARGS.requests} requests, upstream latency {ARGS.latency}ms"
+              f"{', warm caches' if ARGS.warm else ''}):")
+        result["load"] = asyncio.run(run_load(groups))
+    if "micro" in groups:
+        print("micro:")
+        result["micro"] = run_micro()
+    if ARGS.output:
+        with open(ARGS.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if ARGS.compare:
+        with open(ARGS.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+    return 1 if any(r["errors"] for r in result.get("load", [])) else 0
+
+if __name__ == "__main__":
+    sys.exit(main_())
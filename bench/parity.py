@@ -0,0 +1,77 @@
+"""对比 lxml 与 bs4 两种提取引擎在样例页面上的输出是否一致；任一引擎抛出异常都算失败，
+除标记为 EMPTY、专门核对“无结果”行为的用例外，两种引擎都必须提取到条目
+
+用法: python bench/parity.py
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+BASE_URL = "http://localhost:3000"
+
+def params(url: str, a: str, **kw) -> dict:
+    p = {
+        "url": url, "a": a, "code": "test", "t": None, "attr": None, "ts": "a", "as": "a",
+        "charset": "auto", "clean": False, "season": None, "novel": False,
+    }
+    if "as_" in kw: kw["as"] = kw.pop("as_")
+    p.update(kw)
+    return p
+
+EMPTY = "empty"  # 预期没有条目
+
+CASES = [
+    ("novel_index.html", params("https://www.biquge.example/1024/", ".listmain dd a")),
+    ("novel_index.html", params("https://www.biquge.example/1024/", ".listmain dd a", novel=True)),
+    ("novel_index.html", params("https://www.biquge.example/1024/", "dl a", novel=True, clean=True)),
+    ("novel_index.html", params("https://www.biquge.example/1024/", "#info a, .listmain dd:nth-child(n+4) a")),
+    ("novel_index.html", params("https://www.biquge.example/1024/", "dd > a:not([href^=javascript])", as_="d")),
+    ("novel_index.html", params("https://www.biquge.example/1024/", "dt + dd a, .header a")),
+    ("book/index.html", params("https://www.biquge.example/book/", ".listmain dd a", novel=True)),
+    ("book/index.html", params("https://www.biquge.example/book/", ".listmain dd a", novel=True, clean=True)),
+    ("magnet_list.html", params("https://mikan.example/list", 'a[href^="magnet:"]', t="a.title")),
+    ("magnet_list.html", params("https://mikan.example/list", "td a.dl", t="td.name a", season=1)),
+    ("magnet_list.html", params("https://mikan.example/list", "td a.dl", t="td.name a", ts="d", season=2)),
+    ("magnet_list.html", params("https://mikan.example/list", ".files a", season=1)),
+    ("magnet_list.html", params("https://mikan.example/list", "tr:first-child a"), EMPTY),  # 无链接，返回 400
+    ("blog_list.html", params("https://blog.example/", "a.post")),
+    ("blog_list.html", params("https://blog.example/", "#posts h2 a", t=".titles li")),
+    ("blog_list.html", params("https://blog.example/", "a[rel~=next], article a.featured")),
+    ("blog_list.html", params("https://blog.example/", "#posts a", attr="data-href"), EMPTY),  # 属性都为空
+]
+
+def run(html: str, p: dict, engine: str) -> dict:
+    try:
+        feed = main.extract_feed(html, p, BASE_URL, engine=engine)
+    except Exception as e:
+        return {"error": repr(e)}
+    feed.pop("engine", None)
+    return feed
+
+def main_() -> int:
+    failures = 0
+    for name, p, *expect in CASES:
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+            html = f.read()
+        bs4_feed = run(html, p, "bs4")
+        lxml_feed = run(html, p, "lxml")
+        feeds = (bs4_feed, lxml_feed)
+        ok = bs4_feed == lxml_feed and not any("error" in feed for feed in feeds) \
+            and all(bool(feed.get("items")) != (EMPTY in expect) for feed in feeds)
+        print(f"{'ok  ' if ok else 'FAIL'} {name} a={p['a']!r} t={p['t']!r} novel={p['novel']} "
+              f"items={len(lxml_feed.get('items') or [])}")
+        if not ok:
+            failures += 1
+            print(f"  bs4:  {bs4_feed}")
+            print(f"  lxml: {lxml_feed}")
+    print(f"{len(CASES) - failures}/{len(CASES)} cases pass")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main_())
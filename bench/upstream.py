@@ -0,0 +1,29 @@
+"""本地上游站点替身：在后台线程中提供静态页面，可为每个请求加入固定延迟"""
+import functools
+import http.server
+import socketserver
+import threading
+import time
+from collections import Counter
+
+# 各路径被请求的次数，用于校验缓存/单飞是否生效
+REQUESTS: Counter = Counter()
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+
+    def log_message(self, *args): pass
+
+    def send_head(self):
+        REQUESTS[self.path] += 1
+        if self.latency: time.sleep(self.latency)
+        return super().send_head()
+
+def serve(directory: str, latency_ms: float = 0) -> int:
+    """启动服务并返回端口；latency_ms 模拟上游的首字节延迟"""
+    handler = type("Handler", (QuietHandler,), {"latency": latency_ms / 1000})
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), functools.partial(handler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
@@ -5,23 +5,922 @@ import string
 import json
 import re
 import base64
+import zlib
+import codecs
+import email.utils
 import os
 import asyncio
-from typing import List, Optional, Tuple
+import contextvars
+import functools
+import random
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
 import urllib.parse
 
-from fastapi import FastAPI, HTTPException, Query, Request
-from fastapi.responses import Response, FileResponse, HTMLResponse
+from fastapi import BackgroundTasks, Body, FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, FileResponse, HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
 import httpx
-from bs4 import BeautifulSoup
-import charset_normalizer
-import trafilatura
 
-app = FastAPI()
+# bs4、lxml、charset_normalizer 等解析依赖在首次使用时才导入，缩短冷启动；WARMUP=1 时在启动阶段预先加载
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from lxml.cssselect import CSSSelector
 
 # Verification code
 VERIFICATION_CODE = os.getenv("VERIFICATION_CODE", "test")
+
+# 出站连接池配置
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", 6))
+HTTP2_ENABLED = os.getenv("HTTP2", "1") != "0"
+
+# 单个上游主机的限速：令牌桶（每秒请求数/突发量）+ 并发上限，<=0 表示不限速
+# HOST_LIMITS 按域名覆盖，例如 {"www.biquge.com": {"rate": 1, "burst": 2, "concurrency": 2}}，
+# 以 "." 开头的键匹配其所有子域名
+HOST_RATE = float(os.getenv("HOST_RATE", 5))
+HOST_BURST = float(os.getenv("HOST_BURST", 10))
+HOST_LIMITS: Dict[str, dict] = json.loads(os.getenv("HOST_LIMITS", "") or "{}")
+# 失败重试：指数退避 + 全抖动，Retry-After 也以 RETRY_MAX_DELAY 封顶
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 30))
+
+# 上游页面缓存配置：新鲜期内直接复用，过期后带条件请求重新验证
+UPSTREAM_CACHE_TTL = float(os.getenv("UPSTREAM_CACHE_TTL", 60))
+UPSTREAM_CACHE_MAX_BYTES = int(os.getenv("UPSTREAM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+UPSTREAM_CACHE_DIR = os.getenv("UPSTREAM_CACHE_DIR", "")
+# 磁盘层的总字节预算，超出后按最近使用时间淘汰最旧的文件；0 表示不限
+UPSTREAM_CACHE_DISK_MAX_BYTES = int(os.getenv("UPSTREAM_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))
+
+# 自动识别编码时只检查正文前若干字节；识别结果按主机记忆
+CHARSET_SAMPLE_BYTES = int(os.getenv("CHARSET_SAMPLE_BYTES", 64 * 1024))
+CHARSET_META_BYTES = 4096
+CHARSET_MEMO_SIZE = int(os.getenv("CHARSET_MEMO_SIZE", 4096))
+# 单个上游响应体的上限，超过即中止下载
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", 20 * 1024 * 1024))
+
+# 已生成 RSS 的缓存配置，键为规范化后的参数集
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", 60))
+FEED_CACHE_MAX_BYTES = int(os.getenv("FEED_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# 相同键的并发抓取与构建只执行一次（单飞）；设为 0 时每个请求各自执行，供基准测试测量未合并的开销
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") != "0"
+
+# /read 分页：最多合并的页数；parallel 模式下按推断出的页码规律并发抓取
+READ_MAX_PAGES = 5
+READ_PAGINATION = os.getenv("READ_PAGINATION", "parallel")  # parallel | sequential
+# parallel 模式下，页面没有“(1/3)”式页数标记时，在已确认的下一页之外最多多推测几页（推测页可能不存在）
+READ_SPECULATE_PAGES = int(os.getenv("READ_SPECULATE_PAGES", 1))
+
+# /read 阅读页缓存与后续章节预取
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", 600))
+READ_CACHE_MAX_BYTES = int(os.getenv("READ_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+READ_PREFETCH_DEPTH = int(os.getenv("READ_PREFETCH_DEPTH", 1))
+READ_PREFETCH_PER_CLIENT = int(os.getenv("READ_PREFETCH_PER_CLIENT", 2))
+
+# 后台预取调度：被请求过的 feed 在后台按自适应间隔刷新
+FEED_SCHEDULER_ENABLED = os.getenv("FEED_SCHEDULER", "1") != "0"
+FEED_REFRESH_MIN = float(os.getenv("FEED_REFRESH_MIN", 60))
+FEED_REFRESH_MAX = float(os.getenv("FEED_REFRESH_MAX", 3600))
+FEED_REFRESH_CONCURRENCY = int(os.getenv("FEED_REFRESH_CONCURRENCY", 4))
+FEED_IDLE_EXPIRE = float(os.getenv("FEED_IDLE_EXPIRE", 7 * 86400))
+
+# 条目首次出现时间的持久化存储（SQLite）
+ITEM_HISTORY_DB = os.getenv("ITEM_HISTORY_DB", "data/items.db")
+ITEM_HISTORY_MEMORY_FEEDS = int(os.getenv("ITEM_HISTORY_MEMORY_FEEDS", 256))
+# 保留期限（秒）：不再出现在页面上超过该时间的条目被删除；feed 超过 FEED_IDLE_EXPIRE 无人构建时整个删除；0 表示不清理
+ITEM_HISTORY_RETENTION = float(os.getenv("ITEM_HISTORY_RETENTION", 30 * 86400))
+ITEM_HISTORY_SWEEP_INTERVAL = 3600
+
+# 多进程部署：worker 数（也可用 --workers 指定），大于 1 时预先导入应用再 fork
+# 共享后端让各 worker 共用 feed/上游缓存与单飞锁：sqlite:///data/shared.db（同机，多 worker 时的默认值）
+# 或 redis://[:password@]host:6379/0，留空表示只用进程内缓存
+WORKERS = int(os.getenv("WORKERS", 1))
+SHARED_CACHE = os.getenv("SHARED_CACHE", "")
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL", 3600))
+SHARED_LOCK_TTL = float(os.getenv("SHARED_LOCK_TTL", 60))
+# 单次共享后端操作（含排队等连接）的超时秒数，超时即视为后端不可用，退回进程内缓存
+SHARED_CACHE_TIMEOUT = float(os.getenv("SHARED_CACHE_TIMEOUT", 1))
+
+# 批量生成 feed：单次请求最多包含的 feed 数，以及同时抓取/解析的页面数
+BATCH_MAX_FEEDS = int(os.getenv("BATCH_MAX_FEEDS", 500))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+
+# 异步任务：job=1 时缓存未命中的 /html2rss、/read 请求不再等待构建，立即返回 202 与任务 id（有旧结果时返回旧结果并标记为过期），
+# 构建由后台队列完成；JOB_WAIT 为返回 202 前最多等待的秒数，构建较快时仍直接返回结果
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", 100))
+JOB_TTL = float(os.getenv("JOB_TTL", 600))
+JOB_WAIT = float(os.getenv("JOB_WAIT", 0))
+
+# 解析池配置：BeautifulSoup 解析等 CPU 密集步骤不在事件循环上执行
+PARSE_POOL = os.getenv("PARSE_POOL", "thread")  # thread | process
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+PARSE_QUEUE_MAX = int(os.getenv("PARSE_QUEUE_MAX", 32))
+
+# /html2rss 条目提取引擎：lxml（直接在 lxml 树上选择）或 bs4
+FEED_ENGINE = os.getenv("FEED_ENGINE", "lxml")
+# 小说模式：按 feed 记住上次目录区的指纹与各章节规范化后的结果，轮询时只处理新出现的章节；
+# NOVEL_RECENT_ITEMS 大于 0 时只输出目录中最靠后的这些章（按章节在目录中最后出现的位置取，不依赖标题排序；默认 0 表示全部）
+NOVEL_MEMO_MAX_BYTES = int(os.getenv("NOVEL_MEMO_MAX_BYTES", 32 * 1024 * 1024))
+NOVEL_RECENT_ITEMS = int(os.getenv("NOVEL_RECENT_ITEMS", 0))
+# 已编译选择器的 LRU 容量
+SELECTOR_CACHE_SIZE = int(os.getenv("SELECTOR_CACHE_SIZE", 512))
+
+# 启动预热：预先导入解析依赖，用小样例页走一遍各条解析路径，并编译 WARMUP_SELECTORS（逗号分隔）中的选择器；
+# 多进程模式（--workers N）下父进程在 fork 之前总是预热，不受此开关影响
+WARMUP = os.getenv("WARMUP", "0") != "0"
+WARMUP_SELECTORS = os.getenv("WARMUP_SELECTORS", "")
+
+# 运行时计数器，通过 /stats 查看
+STATS: Counter = Counter()
+
+class Metrics:
+    """进程内的计数器与直方图，按 Prometheus 文本格式从 /metrics 导出"""
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.counters: Counter = Counter()
+        # (名称, 标签) -> [各桶计数..., 总和, 次数]
+        self.histograms: Dict[tuple, list] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self.histograms.get(key)
+        if hist is None: hist = self.histograms[key] = [0] * (len(self.BUCKETS) + 2)
+        for i, bound in enumerate(self.BUCKETS):
+            if seconds <= bound: hist[i] += 1
+        hist[-2] += seconds
+        hist[-1] += 1
+
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def _labels(self, labels) -> str:
+        if not labels: return ""
+        return "{" + ",".join(f'{k}="{self._escape(v)}"' for k, v in labels) + "}"
+
+    def render(self, gauges: Dict[tuple, float] = None) -> str:
+        lines, typed = [], set()
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+        for (name, labels), value in sorted(self.counters.items()):
+            name = f"{self.prefix}_{name}"
+            declare(name, "counter")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), value in sorted((gauges or {}).items()):
+            name = f"{self.prefix}_{name}"
+            declare(name, "gauge")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), hist in sorted(self.histograms.items()):
+            name = f"{self.prefix}_{name}"
+            declare(name, "histogram")
+            for bound, count in zip(self.BUCKETS, hist):
+                lines.append(f"{name}_bucket{self._labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_bucket{self._labels(labels + (('le', '+Inf'),))} {hist[-1]}")
+            lines.append(f"{name}_sum{self._labels(labels)} {hist[-2]:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics("html2rss")
+
+# 当前请求的入口（按路由）与各阶段耗时累计，供指标标签和 Server-Timing 使用
+_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("endpoint", default="background")
+_timings: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("timings", default=None)
+# 解析池中的任务只记录耗时，由事件循环一侧汇总进指标（进程池无法共享 METRICS）
+_in_pool: contextvars.ContextVar[bool] = contextvars.ContextVar("in_pool", default=False)
+
+def record_stage(name: str, seconds: float, host: str = ""):
+    timings = _timings.get()
+    if timings is not None: timings[name] = timings.get(name, 0.0) + seconds
+    if not _in_pool.get():
+        METRICS.observe("stage_seconds", seconds, stage=name, endpoint=_endpoint.get(), host=host)
+
+@contextmanager
+def stage(name: str, host: str = ""):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start, host)
+
+def count(event: str, host: str = ""):
+    # 同时计入 /stats 与带 endpoint/host 标签的 /metrics 计数器
+    STATS[event] += 1
+    METRICS.inc("events_total", event=event, endpoint=_endpoint.get(), host=host)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """应用级共享客户端，同源请求复用已建立的 TCP/TLS/HTTP2 连接"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=30.0,
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+class HostLimiter:
+    """单个上游主机的令牌桶 + 并发信号量，并记录排队等待时间"""
+    def __init__(self, rate: float, burst: float, concurrency: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._sem = asyncio.Semaphore(max(concurrency, 1))
+        self._lock = asyncio.Lock()
+        self.queued = 0
+        self.active = 0
+        self.requests = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def _take_token(self):
+        # 持锁排队，保证按到达顺序发放令牌
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.rate <= 0: return
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self):
+        start = time.monotonic()
+        self.queued += 1
+        try:
+            await self._sem.acquire()
+            try:
+                await self._take_token()
+            except BaseException:
+                self._sem.release()
+                raise
+        finally:
+            self.queued -= 1
+        wait = time.monotonic() - start
+        self.requests += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        STATS["host_wait_ms"] += int(wait * 1000)
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+
+    def pause(self, seconds: float):
+        # 上游要求稍后再试（Retry-After）：该主机的所有请求一起暂停
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "active": self.active,
+            "queued": self.queued,
+            "wait_avg_ms": round(self.wait_total / self.requests * 1000, 1) if self.requests else 0,
+            "wait_max_ms": round(self.wait_max * 1000, 1),
+        }
+
+_host_limiters: Dict[str, HostLimiter] = {}
+
+def host_limits(host: str) -> dict:
+    # 精确匹配优先，其次按最长的 ".域名" 后缀匹配
+    host = host.split(":")[0].lower()
+    limits = {"rate": HOST_RATE, "burst": HOST_BURST, "concurrency": HTTP_MAX_PER_HOST}
+    if host in HOST_LIMITS: return {**limits, **HOST_LIMITS[host]}
+    suffixes = [k for k in HOST_LIMITS if k.startswith(".") and (host.endswith(k) or host == k[1:])]
+    if suffixes: limits.update(HOST_LIMITS[max(suffixes, key=len)])
+    return limits
+
+def host_limiter(host: str) -> HostLimiter:
+    limiter = _host_limiters.get(host)
+    if limiter is None:
+        limits = host_limits(host)
+        limiter = _host_limiters[host] = HostLimiter(float(limits["rate"]), float(limits["burst"]), int(limits["concurrency"]))
+    return limiter
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    # Retry-After 可以是秒数，也可以是 HTTP 日期
+    if not value: return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int) -> float:
+    # 指数退避 + 全抖动：在 [0, min(上限, 基数*2^attempt)] 内均匀取值
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+class LRUCache:
+    """按总字节预算淘汰的 LRU 缓存"""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self): return len(self._data)
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None: return None
+        self._data.move_to_end(key)
+        return item[0]
+
+    def set(self, key, value, size: int):
+        self.pop(key)
+        if size > self.max_bytes: return
+        self._data[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, old_size) = self._data.popitem(last=False)
+            self.total_bytes -= old_size
+            STATS["lru_evictions"] += 1
+
+    def pop(self, key):
+        item = self._data.pop(key, None)
+        if item is None: return None
+        self.total_bytes -= item[1]
+        return item[0]
+
+class SqliteStore:
+    """共享后端：同一台机器上的多个进程共用一个 SQLite 文件（WAL）"""
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        # 每个线程各用一个连接；fork 之后在子进程里首次使用时才创建
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if os.path.dirname(self.path): os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT, expires REAL)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._db().execute("SELECT value FROM kv WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, ttl: float):
+        db, now = self._db(), time.time()
+        db.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, value, now + ttl))
+        # 顺带清理过期条目，避免文件无限增长
+        if random.random() < 0.01: db.execute("DELETE FROM kv WHERE expires <= ?", (now,))
+
+    def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        db, now = self._db(), time.time()
+        db.execute("DELETE FROM locks WHERE key = ? AND expires <= ?", (key, now))
+        return db.execute("INSERT OR IGNORE INTO locks VALUES (?, ?, ?)", (key, token, now + ttl)).rowcount == 1
+
+    def _unlock(self, key: str, token: str):
+        self._db().execute("DELETE FROM locks WHERE key = ? AND token = ?", (key, token))
+
+    async def get(self, key: str) -> Optional[bytes]: return await asyncio.to_thread(self._get, key)
+    async def set(self, key: str, value: bytes, ttl: float): await asyncio.to_thread(self._set, key, value, ttl)
+    async def try_lock(self, key: str, token: str, ttl: float) -> bool: return await asyncio.to_thread(self._try_lock, key, token, ttl)
+    async def unlock(self, key: str, token: str): await asyncio.to_thread(self._unlock, key, token)
+
+class RedisError(Exception): pass
+
+class RedisStore:
+    """共享后端：Redis 协议（RESP2）的最小客户端，只用到 GET/SET/DEL，多台机器可共用"""
+    def __init__(self, url: str):
+        parsed = urllib.parse.urlparse(url)
+        self.host, self.port = parsed.hostname or "127.0.0.1", parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+
+    def _close(self):
+        if self._writer: self._writer.close()
+        self._reader = self._writer = None
+
+    async def _call(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await self._reply()
+
+    async def _reply(self):
+        line = await self._reader.readuntil(b"\r\n")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+": return rest.decode()
+        if kind == b"-": raise RedisError(rest.decode())
+        if kind == b":": return int(rest)
+        if kind == b"$":
+            if int(rest) < 0: return None
+            return (await self._reader.readexactly(int(rest) + 2))[:-2]
+        if kind == b"*":
+            if int(rest) < 0: return None
+            return [await self._reply() for _ in range(int(rest))]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _exchange(self, *args):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            if self.password: await self._call("AUTH", self.password)
+            if self.db: await self._call("SELECT", self.db)
+        return await self._call(*args)
+
+    async def command(self, *args):
+        # 单连接串行收发；连接与锁绑定在当前事件循环上，断线后重连一次
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._reader = self._writer = None
+            self._lock, self._loop = asyncio.Lock(), loop
+        deadline = loop.time() + SHARED_CACHE_TIMEOUT
+        await asyncio.wait_for(self._lock.acquire(), SHARED_CACHE_TIMEOUT)
+        try:
+            for attempt in range(2):
+                try:
+                    return await asyncio.wait_for(self._exchange(*args), max(deadline - loop.time(), 0.001))
+                except (OSError, asyncio.IncompleteReadError) as e:
+                    self._close()
+                    if attempt or isinstance(e, TimeoutError): raise
+                except BaseException:
+                    # 已发出命令但未读完回复（取消、超时、协议错误）时连接上残留着旧回复，必须丢弃，
+                    # 否则下一个调用方会读到上一个键的结果
+                    self._close()
+                    raise
+        finally:
+            self._lock.release()
+
+    async def get(self, key: str) -> Optional[bytes]: return await self.command("GET", key)
+    async def set(self, key: str, value: bytes, ttl: float): await self.command("SET", key, value, "PX", int(ttl * 1000))
+
+    async def try_lock(self, key: str, token: str, ttl: float) -> bool:
+        return await self.command("SET", key, token, "NX", "PX", int(ttl * 1000)) == "OK"
+
+    async def unlock(self, key: str, token: str):
+        # 只删除自己持有的锁；GET 与 DEL 之间锁恰好过期并被他人拿到的窗口可以接受
+        if await self.command("GET", key) == token.encode(): await self.command("DEL", key)
+
+def open_shared_store(url: str):
+    if not url: return None
+    if url.startswith("sqlite:///"): return SqliteStore(url[len("sqlite:///"):])
+    if url.startswith("redis://"): return RedisStore(url)
+    raise ValueError(f"Unsupported SHARED_CACHE: {url}")
+
+shared_store = open_shared_store(SHARED_CACHE)
+
+# 共享后端不可用时退化为只用进程内缓存，不影响请求
+async def shared_get(key: str) -> Optional[bytes]:
+    if shared_store is None: return None
+    try:
+        return await shared_store.get("html2rss:" + key)
+    except Exception:
+        count("shared_errors")
+        return None
+
+async def shared_set(key: str, value: bytes, ttl: float):
+    if shared_store is None: return
+    try:
+        await shared_store.set("html2rss:" + key, value, ttl)
+    except Exception:
+        count("shared_errors")
+
+@asynccontextmanager
+async def shared_lock(name: str, ttl: float = SHARED_LOCK_TTL):
+    """跨进程互斥：轮询等待其他 worker 释放，最多等 ttl 秒；锁在 ttl 秒后自动过期，超时或后端出错时不加锁继续"""
+    key, token = "html2rss:lock:" + name, os.urandom(8).hex()
+    deadline, delay = time.monotonic() + ttl, 0.01
+    acquired = False
+    try:
+        acquired = await shared_store.try_lock(key, token, ttl)
+        if not acquired: count("shared_lock_waits")
+        while not acquired and time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            acquired = await shared_store.try_lock(key, token, ttl)
+        if not acquired: count("shared_lock_timeouts")
+    except Exception:
+        count("shared_errors")
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                await shared_store.unlock(key, token)
+            except Exception:
+                count("shared_errors")
+
+class UpstreamCache:
+    """上游响应缓存：内存 LRU + 可选磁盘层，条目保存解码后的正文与校验头"""
+    def __init__(self, max_bytes: int, cache_dir: str = "", disk_max_bytes: int = 0):
+        self.memory = LRUCache(max_bytes)
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        # 磁盘层的估算总大小，None 表示尚未扫描目录；超出预算时重新扫描（目录可能由多个 worker 共用）再淘汰
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        if cache_dir: os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _name(key: Tuple[str, str]) -> str:
+        return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+    def _path(self, key: Tuple[str, str]) -> str:
+        return os.path.join(self.cache_dir, self._name(key))
+
+    def _read_disk(self, key) -> Optional[dict]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                meta = json.loads(f.readline())
+                if tuple(meta.pop('key')) != key: return None
+                # v2 起磁盘上存 UTF-8 文本；旧条目是原始字节，按记录的编码解码
+                body_encoding = 'utf-8' if meta.pop('v', 1) >= 2 else meta.pop('encoding', 'utf-8')
+                meta['text'] = f.read().decode(body_encoding, errors='replace')
+            # 更新修改时间，淘汰时按最近使用排序
+            os.utime(self._path(key))
+            return meta
+        except (OSError, ValueError): return None
+
+    def _scan_disk(self) -> List[Tuple[float, int, str]]:
+        files = []
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                try:
+                    if e.is_file():
+                        st = e.stat()
+                        files.append((st.st_mtime, st.st_size, e.path))
+                except OSError: pass
+        return files
+
+    def _evict_disk(self, added: int):
+        """写入后检查磁盘预算：超出时扫描目录，删除最久未用的文件直到降到预算的 90%"""
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_bytes += added
+            if self._disk_bytes <= self.disk_max_bytes: return
+            files = sorted(self._scan_disk())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.disk_max_bytes * 0.9: break
+                try:
+                    os.remove(path)
+                    total -= size
+                    STATS["upstream_cache_disk_evictions"] += 1
+                except OSError: pass
+            self._disk_bytes = total
+
+    def _write_disk(self, key, entry: dict):
+        meta = {k: v for k, v in entry.items() if k != 'text'}
+        meta['key'] = list(key)
+        meta['v'] = 2
+        tmp = self._path(key) + '.tmp'
+        try:
+            try: old_size = os.path.getsize(self._path(key))
+            except OSError: old_size = 0
+            with open(tmp, 'wb') as f:
+                f.write(json.dumps(meta).encode() + b'\n')
+                f.write(entry['text'].encode('utf-8'))
+                size = f.tell()
+            os.replace(tmp, self._path(key))
+        except OSError: return
+        if self.disk_max_bytes > 0: self._evict_disk(size - old_size)
+
+    async def get(self, key) -> Optional[dict]:
+        entry = self.memory.get(key)
+        if entry is None and self.cache_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                STATS["upstream_cache_disk_loads"] += 1
+                self.memory.set(key, entry, sys.getsizeof(entry['text']))
+        if shared_store is not None and (entry is None or time.time() - entry['fetched_at'] >= UPSTREAM_CACHE_TTL):
+            # 本进程的副本缺失或已过期：其他 worker 可能刚抓取过
+            data = await shared_get("upstream:" + self._name(key))
+            shared = json.loads(data) if data else None
+            if shared and (entry is None or shared['fetched_at'] > entry['fetched_at']):
+                STATS["upstream_cache_shared_loads"] += 1
+                entry = shared
+                self.memory.set(key, entry, sys.getsizeof(entry['text']))
+        return entry
+
+    async def set(self, key, entry: dict):
+        self.memory.set(key, entry, sys.getsizeof(entry['text']))
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_disk, key, entry)
+        if shared_store is not None:
+            await shared_set("upstream:" + self._name(key), json.dumps(entry, ensure_ascii=False).encode(), SHARED_CACHE_TTL)
+
+class SingleFlight:
+    """相同键的并发调用只执行一次，其余调用方等待并共享同一结果；
+    shared 为真且配置了共享后端时再加一把跨进程锁，其他 worker 正在执行时等它完成"""
+    def __init__(self, name: str, shared: bool = False):
+        self.name = name
+        self.shared = shared
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def _run(self, key, fn, args: tuple):
+        if not self.shared or shared_store is None: return await fn(*args)
+        # 拿到锁后 fn 自己会先查（共享）缓存，通常直接命中其他 worker 刚写入的结果
+        async with shared_lock(f"{self.name}:{hashlib.sha1(repr(key).encode()).hexdigest()}"):
+            return await fn(*args)
+
+    async def do(self, key, fn, *args):
+        if not SINGLE_FLIGHT: return await self._run(key, fn, args)
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None) if self._tasks.get(key) is task else None)
+        else:
+            count(f"{self.name}_coalesced")
+        # shield：某个调用方断开不会取消其他人正在等待的任务
+        return await asyncio.shield(task)
+
+class ItemHistory:
+    """条目历史：记录每个 feed 中各 GUID 的首次出现时间，使 pubDate 在重建间保持稳定"""
+    def __init__(self, path: str, memory_feeds: int, retention: float = 0, idle_expire: float = 0):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # 最近构建过的 feed 的 GUID -> 首次出现时间，重建时只有新 GUID 需要访问数据库
+        self._recent: OrderedDict = OrderedDict()
+        self._memory_feeds = memory_feeds
+        self.retention = retention
+        self.idle_expire = idle_expire
+        # last_seen 只需粗粒度：每个 feed 最多每隔 _touch_interval 秒批量刷新一次，避免每次重建都写库
+        self._touch_interval = min([86400.0, *(t / 4 for t in (retention, idle_expire) if t > 0)])
+        self._touched: Dict[str, float] = {}
+        self._swept = 0.0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:" and os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS items (feed TEXT, guid TEXT, first_seen REAL, last_seen REAL, "
+                "PRIMARY KEY (feed, guid)) WITHOUT ROWID"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(items)")]
+            if "last_seen" not in columns:
+                # 旧库没有 last_seen：从升级时刻起计算保留期限
+                try:
+                    self._conn.execute("ALTER TABLE items ADD COLUMN last_seen REAL")
+                    self._conn.execute("UPDATE items SET last_seen = ?", (time.time(),))
+                    self._conn.commit()
+                except sqlite3.OperationalError: pass  # 其他进程已完成升级
+        return self._conn
+
+    def _touch(self, db: sqlite3.Connection, feed: str, guids: List[str], now: float):
+        if now - self._touched.get(feed, 0.0) < self._touch_interval: return
+        for i in range(0, len(guids), 500):
+            part = guids[i:i + 500]
+            db.execute(f"UPDATE items SET last_seen = ? WHERE feed = ? AND guid IN ({','.join('?' * len(part))})",
+                       [now, feed, *part])
+        db.commit()
+        self._touched[feed] = now
+
+    def _sweep(self, db: sqlite3.Connection, now: float):
+        """删除久未出现的条目，以及长期无人构建的 feed 的全部条目"""
+        if self.retention <= 0 or now - self._swept < ITEM_HISTORY_SWEEP_INTERVAL: return
+        self._swept = now
+        deleted = db.execute("DELETE FROM items WHERE last_seen < ?", (now - self.retention,)).rowcount
+        if self.idle_expire > 0:
+            deleted += db.execute(
+                "DELETE FROM items WHERE feed IN (SELECT feed FROM items GROUP BY feed HAVING MAX(last_seen) < ?)",
+                (now - self.idle_expire,),
+            ).rowcount
+        db.commit()
+        self._touched = {f: t for f, t in self._touched.items() if now - t < self._touch_interval}
+        if deleted > 0:
+            # 内存中的副本可能引用了刚删除的行，清空后下次构建从库中重新读取
+            self._recent.clear()
+            STATS["history_items_expired"] += deleted
+
+    def _first_seen(self, feed: str, guids: List[str], now: float) -> List[float]:
+        with self._lock:
+            known = self._recent.pop(feed, None)
+            if known is None:
+                known = {}
+            missing = [g for g in guids if g not in known]
+            db = self._db() if missing or self.retention > 0 else None
+            if missing:
+                for i in range(0, len(missing), 500):
+                    part = missing[i:i + 500]
+                    rows = db.execute(
+                        f"SELECT guid, first_seen FROM items WHERE feed = ? AND guid IN ({','.join('?' * len(part))})",
+                        [feed, *part],
+                    )
+                    known.update(rows)
+                new = [g for g in missing if g not in known]
+                if new:
+                    # 首次构建时沿用按位置递减的时间；之后新出现的条目记为当前时间
+                    is_first_build = len(new) == len(guids)
+                    positions = {g: i for i, g in enumerate(guids)}
+                    stamps = {g: now - (positions[g] * 60 if is_first_build else j) for j, g in enumerate(new)}
+                    db.executemany("INSERT OR IGNORE INTO items (feed, guid, first_seen, last_seen) VALUES (?, ?, ?, ?)",
+                                   [(feed, g, t, now) for g, t in stamps.items()])
+                    db.commit()
+                    # 其他进程可能同时插入了相同条目，以库中实际保存的时间为准
+                    known.update(stamps)
+                    for i in range(0, len(new), 500):
+                        part = new[i:i + 500]
+                        known.update(db.execute(
+                            f"SELECT guid, first_seen FROM items WHERE feed = ? AND guid IN ({','.join('?' * len(part))})",
+                            [feed, *part],
+                        ))
+                    STATS["history_new_items"] += len(new)
+            if self.retention > 0:
+                self._touch(db, feed, guids, now)
+                self._sweep(db, now)
+            # 只保留当前条目，避免内存随历史无限增长
+            self._recent[feed] = {g: known[g] for g in guids}
+            while len(self._recent) > self._memory_feeds:
+                self._recent.popitem(last=False)
+            return [known[g] for g in guids]
+
+    async def first_seen(self, feed: str, guids: List[str]) -> List[float]:
+        return await asyncio.to_thread(self._first_seen, feed, guids, time.time())
+
+def history_key(params: dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+upstream_cache = UpstreamCache(UPSTREAM_CACHE_MAX_BYTES, UPSTREAM_CACHE_DIR, UPSTREAM_CACHE_DISK_MAX_BYTES)
+feed_cache = LRUCache(FEED_CACHE_MAX_BYTES)
+charset_memo = LRUCache(CHARSET_MEMO_SIZE)
+fetch_flight = SingleFlight("fetch", shared=True)
+feed_flight = SingleFlight("feed", shared=True)
+reader_cache = LRUCache(READ_CACHE_MAX_BYTES)
+# 在解析池线程中读写，需要加锁
+novel_memo = LRUCache(NOVEL_MEMO_MAX_BYTES)
+_novel_memo_lock = threading.Lock()
+read_flight = SingleFlight("read")
+_prefetch_clients: Counter = Counter()
+item_history = ItemHistory(ITEM_HISTORY_DB, ITEM_HISTORY_MEMORY_FEEDS, ITEM_HISTORY_RETENTION, FEED_IDLE_EXPIRE)
+
+_parse_executor: Optional[Executor] = None
+_parse_pending = 0
+
+def get_parse_executor() -> Executor:
+    global _parse_executor
+    if _parse_executor is None:
+        if PARSE_POOL == "process":
+            _parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        else:
+            _parse_executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="parse")
+    return _parse_executor
+
+def shutdown_parse_executor():
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+
+def _pool_call(fn, args: tuple, stage_name: Optional[str], submitted_at: float) -> tuple:
+    # 在工作线程/进程中执行，连同排队时间与各阶段耗时一起返回
+    timings = {"pool_wait": time.monotonic() - submitted_at}
+    tokens = _timings.set(timings), _in_pool.set(True)
+    try:
+        start = time.perf_counter()
+        result = fn(*args)
+        if stage_name: timings[stage_name] = timings.get(stage_name, 0.0) + time.perf_counter() - start
+        return result, timings
+    finally:
+        _timings.reset(tokens[0])
+        _in_pool.reset(tokens[1])
+
+async def run_in_pool(fn, *args, stage_name: Optional[str] = None, host: str = ""):
+    """在解析池中执行 fn；排队任务超过上限时直接返回 503，避免延迟无限增长
+
+    stage_name 不为空时 fn 的总耗时记为该阶段；fn 内部用 stage() 记录的阶段也会带回并计入指标
+    """
+    global _parse_pending
+    if _parse_pending >= PARSE_WORKERS + PARSE_QUEUE_MAX:
+        STATS["parse_rejected"] += 1
+        raise HTTPException(status_code=503, detail="Parser pool overloaded", headers={"Retry-After": "1"})
+    _parse_pending += 1
+    try:
+        result, timings = await asyncio.get_running_loop().run_in_executor(
+            get_parse_executor(), _pool_call, fn, args, stage_name, time.monotonic())
+    finally:
+        _parse_pending -= 1
+    for name, seconds in timings.items(): record_stage(name, seconds, host)
+    return result
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP: warmup()
+    get_http_client()
+    get_parse_executor()
+    scheduler_task = asyncio.create_task(feed_scheduler.run()) if FEED_SCHEDULER_ENABLED else None
+    job_queue.start()
+    try:
+        yield
+    finally:
+        if scheduler_task: scheduler_task.cancel()
+        job_queue.stop()
+        await close_http_client()
+        shutdown_parse_executor()
+
+class TimingMiddleware:
+    """按路由记录请求耗时，收集本次请求各阶段耗时并写入 Server-Timing 响应头"""
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def endpoint_of(scope) -> str:
+        for route in app.router.routes:
+            if route.matches(scope)[0] == Match.FULL: return getattr(route, "path", "") or "static"
+        return "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http": return await self.app(scope, receive, send)
+        endpoint = self.endpoint_of(scope)
+        timings: Dict[str, float] = {}
+        tokens = _endpoint.set(endpoint), _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def finish():
+            # 响应体发完即计时结束；之后 Starlette 在同一上下文中执行的 BackgroundTasks（如下一章预取）记为 background
+            nonlocal recorded
+            recorded = True
+            METRICS.observe("request_seconds", time.perf_counter() - start, endpoint=endpoint, status=str(status))
+            _endpoint.set("background")
+            _timings.set(None)
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                entries = [headers["server-timing"]] if "server-timing" in headers else []
+                entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+                entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                headers["server-timing"] = ", ".join(entries)
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not recorded:
+                finish()
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if not recorded: finish()
+            _endpoint.reset(tokens[0])
+            _timings.reset(tokens[1])
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TimingMiddleware)
 BASE62_ALPHABET = string.digits + string.ascii_letters
 
 def encode_base62(num: int) -> str:
@@ -34,28 +933,83 @@ def encode_base62(num: int) -> str:
     arr.reverse()
     return ''.join(arr)
 
+_BASE62_INDEX = {c: i for i, c in enumerate(BASE62_ALPHABET)}
+
 def decode_base62(s: str) -> int:
-    base = len(BASE62_ALPHABET)
-    num = 0
-    for char in s:
-        num = num * base + BASE62_ALPHABET.index(char)
-    return num
+    # 分治：左半 * 62^len(右半) + 右半，大数乘法走 Karatsuba，避免逐字符累乘的平方复杂度
+    if len(s) <= 64:
+        num = 0
+        for char in s:
+            num = num * 62 + _BASE62_INDEX[char]
+        return num
+    mid = len(s) // 2
+    return decode_base62(s[:mid]) * _base62_power(len(s) - mid) + decode_base62(s[mid:])
+
+@functools.lru_cache(maxsize=256)
+def _base62_power(n: int) -> int:
+    return 62 ** n
+
+# 参数 p 的编码：旧格式为整段 JSON 字节转成的 base62 大整数；
+# 新格式以 "_" 开头（base62 中不会出现），"_0" + base64url(JSON)，"_1" + base64url(raw deflate(JSON))
+P_MAX_JSON_BYTES = 64 * 1024
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def b64url_decode(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + '=' * (-len(s) % 4))
+
+def encode_params(params: dict) -> str:
+    """编码 feed 参数，压缩后更短时用 _1，否则用 _0"""
+    raw = json.dumps(params, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    packed = compressor.compress(raw) + compressor.flush()
+    return "_1" + b64url_encode(packed) if len(packed) < len(raw) else "_0" + b64url_encode(raw)
+
+def decode_params(p: str) -> dict:
+    if p.startswith("_1"):
+        decompressor = zlib.decompressobj(-15)
+        raw = decompressor.decompress(b64url_decode(p[2:]), P_MAX_JSON_BYTES)
+        if decompressor.unconsumed_tail: raise ValueError("parameters too large")
+    elif p.startswith("_0"):
+        raw = b64url_decode(p[2:])
+    elif p.startswith("_"):
+        raise ValueError(f"unknown parameter codec {p[:2]!r}")
+    else:
+        num = decode_base62(p)
+        raw = num.to_bytes((num.bit_length() + 7) // 8, 'big')
+    params = json.loads(raw.decode('utf-8'))
+    if not isinstance(params, dict): raise ValueError("parameters must be a JSON object")
+    return params
 
 def get_short_id(message: str) -> str:
     hash_obj = hashlib.md5(message.encode())
     num = int.from_bytes(hash_obj.digest()[:8], 'big')
     return encode_base62(num)
 
-async def generate_rss(
+RSS_TAIL = """
+  </channel>
+</rss>"""
+
+def iter_rss(
     title: str,
     link: str,
     description: str,
-    items: List[dict]
-) -> str:
-    rss_items = []
+    items: List[dict],
+    dates: Optional[List[float]] = None
+) -> Iterator[bytes]:
+    """逐段生成 UTF-8 编码的 RSS：频道头、每个条目各一段、结尾；dates 为各条目的发布时间"""
+    yield f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:torrent="https://mikanani.me/0.1/">
+  <channel>
+    <title><![CDATA[{title}]]></title>
+    <link>{link}</link>
+    <description><![CDATA[{description}]]></description>
+    <lastBuildDate>{time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())}</lastBuildDate>""".encode('utf-8')
+
     now = time.time()
     for i, item in enumerate(items):
-        item_time = now - i * 60
+        item_time = dates[i] if dates else now - i * 60
         date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(item_time))
         item_title = item['title'].strip()
         item_link = item['link']
@@ -63,7 +1017,7 @@ async def generate_rss(
         
         if item_link.startswith("magnet:"):
             enclosure_url = html.escape(item_link)
-            rss_items.append(f"""
+            yield f"""
     <item>
       <title><![CDATA[{item_title}]]></title>
       <link><![CDATA[{item_link}]]></link>
@@ -74,26 +1028,18 @@ async def generate_rss(
         <link><![CDATA[{item_link}]]></link>
       </torrent>
       <description><![CDATA[{item_title or description}]]></description>
-    </item>""")
+    </item>""".encode('utf-8')
         else:
-            rss_items.append(f"""
+            yield f"""
     <item>
       <title><![CDATA[{item_title}]]></title>
       <link><![CDATA[{item_link}]]></link>
       <guid isPermaLink="false">{item_guid}</guid>
       <pubDate>{date}</pubDate>
       <description><![CDATA[{item_title or description}]]></description>
-    </item>""")
+    </item>""".encode('utf-8')
 
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0" xmlns:torrent="https://mikanani.me/0.1/">
-  <channel>
-    <title><![CDATA[{title}]]></title>
-    <link>{link}</link>
-    <description><![CDATA[{description}]]></description>
-    <lastBuildDate>{time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())}</lastBuildDate>{"".join(rss_items)}
-  </channel>
-</rss>"""
+    yield RSS_TAIL.encode('utf-8')
 
 def url_encode_proxy(url: str) -> str:
     return base64.urlsafe_b64encode(url.encode()).decode().rstrip('=')
@@ -112,7 +1058,7 @@ def extract_magnet_dn(url: str) -> Optional[str]:
         return urllib.parse.unquote(match.group(1)).strip()
     return None
 
-def clean_content_title(soup: BeautifulSoup, raw_title: str) -> str:
+def clean_content_title(soup: "BeautifulSoup", raw_title: str) -> str:
     # 优先寻找正文标题特征
     for tag in ['h1', 'h2', 'strong', 'b']:
         for el in soup.find_all(tag):
@@ -124,10 +1070,187 @@ def clean_content_title(soup: BeautifulSoup, raw_title: str) -> str:
     title = re.sub(r'(最新章节|全文阅读|小说|在线阅读|无弹窗|目录|正文|第.*?页|[(（]\d+/\d+[)）]).*', '', title)
     return title.strip()
 
-async def fetch_html_raw(url: str, charset: Optional[str] = None) -> Tuple[str, bytes]:
+# 编码别名归一：GBK/GB2312 统一按超集 GB18030 解码
+_CHARSET_ALIASES = {"gbk": "gb18030", "gb2312": "gb18030", "gb_2312-80": "gb18030", "x-gbk": "gb18030", "cp936": "gb18030"}
+_CONTENT_TYPE_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+_NON_ASCII_RE = re.compile(rb'[\x80-\xff]')
+_BOMS = [(codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+         (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+
+def normalize_charset(name: Optional[str]) -> Optional[str]:
+    if not name: return None
+    name = name.strip().lower()
+    name = _CHARSET_ALIASES.get(name, name)
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
+
+def charset_fits(sample: bytes, encoding: str) -> bool:
+    # 在样本上严格解码验证；样本可能截断在多字节字符中间，故不做 final 检查
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+def _usable_charset(encoding: Optional[str]) -> Optional[str]:
+    # ascii 只说明样本里没有非 ASCII 字节，不能据此解码后续内容，按未识别处理
+    if encoding and codecs.lookup(encoding).name == "ascii": return None
+    return encoding
+
+def sniff_charset(content: bytes, content_type: Optional[str] = None, host: Optional[str] = None,
+                  detect: bool = True) -> Tuple[Optional[str], str]:
+    """按开销从低到高推断编码，返回 (编码, 来源)；都不可靠时返回 (None, "fallback")，从不返回 ascii。
+    detect 为假时跳过统计检测（样本太短时并不可靠）"""
+    sample = content[:CHARSET_SAMPLE_BYTES]
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom): return encoding, "bom"
+    # 声明的编码经常与实际不符，必须通过严格解码验证
+    match = _CONTENT_TYPE_CHARSET_RE.search(content_type or "")
+    encoding = _usable_charset(normalize_charset(match.group(1))) if match else None
+    if encoding and charset_fits(sample, encoding): return encoding, "header"
+    match = _META_CHARSET_RE.search(sample[:CHARSET_META_BYTES])
+    encoding = _usable_charset(normalize_charset(match.group(1).decode("ascii", "ignore"))) if match else None
+    if encoding and charset_fits(sample, encoding): return encoding, "meta"
+    encoding = _usable_charset(charset_memo.get(host)) if host else None
+    if encoding and charset_fits(sample, encoding): return encoding, "memo"
+    # 纯 ASCII 样本（如页首大段内联脚本、样式）看不出编码，交给调用方继续取样或兜底
+    if sample.isascii(): return None, "ascii"
+    # 含非 ASCII 字节且能严格按 UTF-8 解码，几乎可以肯定就是 UTF-8
+    if charset_fits(sample, "utf-8"): return "utf-8", "utf8"
+    if not detect: return None, "fallback"
+    try:
+        import charset_normalizer
+        detection = charset_normalizer.from_bytes(sample).best()
+        if detection and detection.chaos <= 0.2:
+            encoding = _usable_charset(normalize_charset(detection.encoding))
+            if encoding: return encoding, "detected"
+    except Exception: pass
+    return None, "fallback"
+
+def pick_encoding(sample: bytes, charset: Optional[str] = None, content_type: Optional[str] = None,
+                  host: Optional[str] = None, detect: bool = True) -> Optional[str]:
+    """根据正文样本确定编码；无法判断时返回 None，由调用方走 GB18030/UTF-8 兜底"""
+    # 1. 优先使用用户手动指定的编码
+    if charset and charset.lower() != "auto":
+        try:
+            return codecs.lookup(charset).name
+        except LookupError: pass
+
+    # 2. 自动识别：BOM / Content-Type / <meta> / 同站记忆 / 统计检测（只看样本）
+    encoding, source = sniff_charset(sample, content_type, host, detect)
+    STATS[f"charset_{source}"] += 1
+    if encoding and host and source != "memo": charset_memo.set(host, encoding, 1)
+    return encoding
+
+def decode_fallback(content: bytes) -> str:
+    # 3. 都没把握时暴力尝试 GB18030 (兼容 GBK/GB2312)，最后退回 UTF-8
+    try:
+        return content.decode("gb18030")
+    except UnicodeDecodeError:
+        return content.decode("utf-8", errors="replace")
+
+def decode_content(content: bytes, charset: Optional[str] = None, content_type: Optional[str] = None,
+                   host: Optional[str] = None) -> str:
+    encoding = pick_encoding(content, charset, content_type, host)
+    if encoding is None:
+        # 样本是纯 ASCII 时从第一个非 ASCII 字节起重新取样
+        first = _NON_ASCII_RE.search(content, CHARSET_SAMPLE_BYTES)
+        if first and content[:first.start()].isascii():
+            encoding = pick_encoding(content[first.start():], charset, content_type, host,
+                                     detect=len(content) - first.start() >= CHARSET_SAMPLE_BYTES)
+    return content.decode(encoding, errors="replace") if encoding else decode_fallback(content)
+
+async def read_body(response: httpx.Response, charset: Optional[str], host: str, until: Optional[str] = None) -> str:
+    """边下载边解码，不保留原始字节；超过 FETCH_MAX_BYTES 时中止，出现 until 标记后提前结束下载"""
+    length = response.headers.get("content-length", "")
+    if length.isdigit() and int(length) > FETCH_MAX_BYTES:
+        STATS["fetch_too_large"] += 1
+        raise HTTPException(status_code=502, detail=f"Upstream body exceeds {FETCH_MAX_BYTES} bytes")
+    content_type = response.headers.get("content-type")
+    pending = bytearray()
+    parts: List[str] = []
+    decoder = None
+    undecided = False
+    resampled = False
+    carry = ""
+    received = 0
+    async for chunk in response.aiter_bytes():
+        received += len(chunk)
+        if received > FETCH_MAX_BYTES:
+            STATS["fetch_too_large"] += 1
+            raise HTTPException(status_code=502, detail=f"Upstream body exceeds {FETCH_MAX_BYTES} bytes")
+        if decoder is None:
+            # 攒够一个样本再确定编码；无法确定时只能整体缓冲，最后兜底解码
+            pending += chunk
+            if undecided or len(pending) < CHARSET_SAMPLE_BYTES: continue
+            with stage("charset", host):
+                encoding = pick_encoding(bytes(pending), charset, content_type, host)
+            if encoding is None:
+                first = _NON_ASCII_RE.search(pending)
+                if first is None or first.start() >= CHARSET_SAMPLE_BYTES:
+                    # 样本是纯 ASCII：这一段在任何兼容 ASCII 的编码下都相同，直接输出，从第一个非 ASCII 字节起重新取样
+                    cut = len(pending) if first is None else first.start()
+                    text = pending[:cut].decode("ascii")
+                    del pending[:cut]
+                    resampled = True
+                else:
+                    undecided = True
+                    continue
+            else:
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                text = decoder.decode(bytes(pending))
+                pending.clear()
+        else:
+            text = decoder.decode(chunk)
+        parts.append(text)
+        if until:
+            window = carry + text
+            if until in window:
+                STATS["fetch_early_stops"] += 1
+                return "".join(parts)
+            carry = window[len(window) - len(until) + 1:]
+    if decoder is not None:
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+    with stage("charset", host):
+        if undecided: parts.append(decode_fallback(bytes(pending)))
+        elif resampled and pending:
+            # 纯 ASCII 前缀之后剩下的内容不足一个样本，统计检测在短文本上不可靠：只看同站记忆与严格 UTF-8，否则兜底
+            encoding = pick_encoding(bytes(pending), charset, content_type, host, detect=False)
+            parts.append(pending.decode(encoding, errors="replace") if encoding else decode_fallback(bytes(pending)))
+        # 正文不足一个样本
+        elif pending: parts.append(decode_content(bytes(pending), charset, content_type, host))
+    return "".join(parts)
+
+# httpcore trace 事件对：(阶段名, 开始事件, 结束事件)
+_TRACE_SPANS = [
+    ("connect", "connection.connect_tcp.started", "connection.connect_tcp.complete"),
+    ("tls", "connection.start_tls.started", "connection.start_tls.complete"),
+    ("ttfb", "http11.send_request_headers.started", "http11.receive_response_headers.complete"),
+    ("ttfb", "http2.send_request_headers.started", "http2.receive_response_headers.complete"),
+]
+
+def record_trace(marks: Dict[str, float], host: str):
+    for name, start, end in _TRACE_SPANS:
+        if start in marks and end in marks: record_stage(name, marks[end] - marks[start], host)
+
+async def fetch_html_raw(url: str, charset: Optional[str] = None, attempts: int = 3, until: Optional[str] = None) -> str:
+    cache_key = (url, (charset or "auto").lower(), until) if until else (url, (charset or "auto").lower())
+    return await fetch_flight.do(cache_key, _fetch_html_raw, url, charset, cache_key, attempts, until)
+
+async def _fetch_html_raw(url: str, charset: Optional[str], cache_key: tuple, attempts: int, until: Optional[str]) -> str:
     parsed_url = urllib.parse.urlparse(url)
     base_url = f"{parsed_url.scheme}://{parsed_url.netloc}/"
     
+    cached = await upstream_cache.get(cache_key)
+    if cached and time.time() - cached['fetched_at'] < UPSTREAM_CACHE_TTL:
+        count("upstream_cache_hits", parsed_url.netloc)
+        return cached['text']
+
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
@@ -135,311 +1258,526 @@ async def fetch_html_raw(url: str, charset: Optional[str] = None) -> Tuple[str,
         'Connection': 'keep-alive',
         'Referer': base_url,
     }
+    # 缓存已过期：带上校验头，让上游在未变化时返回 304
+    if cached:
+        if cached.get('etag'): headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'): headers['If-Modified-Since'] = cached['last_modified']
 
     last_error = None
-    for attempt in range(3):
+    for attempt in range(attempts):
         try:
-            async with httpx.AsyncClient(
-                follow_redirects=True, 
-                timeout=30.0, 
-                headers=headers,
-                http2=True
-            ) as client:
-                response = await client.get(url)
-                if response.status_code != 200:
-                    last_error = f"Status {response.status_code}"
-                    await asyncio.sleep(1)
-                    continue
-                
-                content = response.content
-                
-                # 1. 优先使用用户手动指定的编码
-                if charset and charset.lower() != "auto":
-                    try:
-                        return content.decode(charset, errors="replace"), content
-                    except: pass
-
-                # 2. 自动识别：不依赖 header，直接尝试
-                html_text = None
-                
-                # 尝试 A: 使用 charset_normalizer
-                try:
-                    detection = charset_normalizer.from_bytes(content).best()
-                    if detection and detection.confidence > 0.8:
-                        html_text = content.decode(detection.encoding, errors="replace")
-                except: pass
-
-                # 尝试 B: 如果 A 没把握，暴力尝试 GB18030 (兼容 GBK/GB2312)
-                if not html_text:
-                    try:
-                        # GB18030 是最全的中文编码集
-                        html_text = content.decode("gb18030")
-                    except:
-                        # 尝试 C: 最后的退路 UTF-8
-                        html_text = content.decode("utf-8", errors="replace")
-                    
-                return html_text, content
+            # 通过 trace 钩子记录连接、TLS 与首字节各阶段的时间点，并判断本次请求是否新建了连接
+            marks: Dict[str, float] = {}
+            async def trace(event_name, info):
+                marks[event_name] = time.perf_counter()
+
+            limiter = host_limiter(parsed_url.netloc)
+            queued_at = time.perf_counter()
+            async with limiter.slot():
+                record_stage("queue", time.perf_counter() - queued_at, parsed_url.netloc)
+                started = time.perf_counter()
+                async with get_http_client().stream("GET", url, headers=headers, extensions={"trace": trace}) as response:
+                    if response.status_code == 200:
+                        with stage("download", parsed_url.netloc):
+                            html_text = await read_body(response, charset, parsed_url.netloc, until)
+                METRICS.observe("upstream_request_seconds", time.perf_counter() - started,
+                                host=parsed_url.netloc, status=str(response.status_code))
+            record_trace(marks, parsed_url.netloc)
+            STATS["pool_misses" if "connection.connect_tcp.started" in marks else "pool_hits"] += 1
+            if response.status_code == 304 and cached:
+                count("upstream_cache_revalidated", parsed_url.netloc)
+                cached = dict(cached, fetched_at=time.time())
+                await upstream_cache.set(cache_key, cached)
+                return cached['text']
+            if response.status_code != 200:
+                last_error = f"Status {response.status_code}"
+                delay = backoff_delay(attempt)
+                if response.status_code in (429, 503):
+                    retry_after = retry_after_seconds(response.headers.get("retry-after"))
+                    if retry_after is not None:
+                        delay = min(retry_after, RETRY_MAX_DELAY)
+                        limiter.pause(delay)
+                        count("upstream_retry_after", parsed_url.netloc)
+                if attempt + 1 < attempts:
+                    count("upstream_retries", parsed_url.netloc)
+                    await asyncio.sleep(delay)
+                continue
+            
+            count("upstream_cache_misses", parsed_url.netloc)
+            await upstream_cache.set(cache_key, {
+                'text': html_text,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+                'fetched_at': time.time(),
+            })
+            return html_text
+        except HTTPException: raise
         except Exception as e:
             last_error = str(e)
-            await asyncio.sleep(1)
+            if attempt + 1 < attempts:
+                count("upstream_retries", parsed_url.netloc)
+                await asyncio.sleep(backoff_delay(attempt))
             
-    raise HTTPException(status_code=500, detail=f"Failed to fetch {url} after 3 attempts: {last_error}")
+    raise HTTPException(status_code=500, detail=f"Failed to fetch {url} after {attempts} attempts: {last_error}")
+
+# 正文清洗用的垃圾行特征，合并成一个正则单次扫描
+JUNK_PATTERNS = [
+    r'上一[章页]', r'下一[章页]', r'目[录次]', r'书[架签]', r'加入书', r'推荐本', r'收藏本',
+    r'选择背景', r'选择字体', r'font[a-z0-9]+', r'繁體', r'阅读[器网]', r'投推荐', r'返回',
+    r'快捷键', r'Ctrl', r'所有文字', r'由网友', r'本站立场', r'Copyright', r'All rights',
+    r'read[0-9]*\(\);', r'javascript', r'www\.', r'http', r'\.com', r'\.net', r'温馨提示',
+    r'章节错误', r'点此举报', r'重要声明', r'不得转载', r'手机版', r'客户端'
+]
+# 每个特征一个捕获组，包在零宽先行断言里，这样每个位置都会被检查且不吞掉字符；
+# 上面的特征两两不会在同一位置同时命中，因此命中的组号集合等价于逐个 re.search
+_JUNK_RE = re.compile('(?=' + '|'.join(f'({p})' for p in JUNK_PATTERNS) + ')', re.I)
+_MULTI_BLANK_RE = re.compile(r'[\t ]{2,}')
+_COPYRIGHT_RE = re.compile(r'©|20\d{2}')
+_SEPARATOR_LINE_RE = re.compile(r'^[_\-\s\*]+$')
+_WHITESPACE_RE = re.compile(r'[\s\u3000\xa0]+')
+# 标题中的分页标记：（1/3）、(2/3)、第1/3页
+_PAGE_COUNTER_RE = re.compile(r'(?:[（(]|第)\s*(\d{1,3})\s*/\s*(\d{1,3})\s*(?:[）)]|页)')
+
+def junk_hit_count(line: str) -> int:
+    """返回行内命中的不同垃圾特征数量"""
+    return len({m.lastindex for m in _JUNK_RE.finditer(line)})
 
 def process_pure_content(text: str) -> str:
     """通用正文清洗与分段"""
     if not text: return ""
-    text = re.sub(r'[\t ]{2,}', '\n', text)
-    text = re.sub(r'\|', '\n', text)
+    text = _MULTI_BLANK_RE.sub('\n', text)
+    text = text.replace('|', '\n')
     lines = text.split('\n')
     clean_lines = []
     
-    junk_patterns = [
-        r'上一[章页]', r'下一[章页]', r'目[录次]', r'书[架签]', r'加入书', r'推荐本', r'收藏本',
-        r'选择背景', r'选择字体', r'font[a-z0-9]+', r'繁體', r'阅读[器网]', r'投推荐', r'返回',
-        r'快捷键', r'Ctrl', r'所有文字', r'由网友', r'本站立场', r'Copyright', r'All rights',
-        r'read[0-9]*\(\);', r'javascript', r'www\.', r'http', r'\.com', r'\.net', r'温馨提示',
-        r'章节错误', r'点此举报', r'重要声明', r'不得转载', r'手机版', r'客户端'
-    ]
-    
     for line in lines:
         line = line.strip()
         if not line or len(line) < 2: continue
-        hit_count = sum(1 for p in junk_patterns if re.search(p, line, re.I))
+        hit_count = junk_hit_count(line)
         if hit_count >= 2: continue
         if hit_count >= 1 and len(line) < 45: continue
-        if re.search(r'©|20\d{2}', line): continue
-        if re.match(r'^[_\-\s\*]+$', line): continue
+        if _COPYRIGHT_RE.search(line): continue
+        if _SEPARATOR_LINE_RE.match(line): continue
         
         # 去除全角空格、&nbsp; 等各种空白字符，并进行规范化
-        line = re.sub(r'[\s\u3000\xa0]+', ' ', line).strip()
+        line = _WHITESPACE_RE.sub(' ', line).strip()
         if line:
             clean_lines.append(f"<p>{line}</p>")
             
     return "".join(clean_lines)
 
-@app.get("/read")
-async def read_clean(url: str, code: str):
-    if code != VERIFICATION_CODE:
-        return HTMLResponse("Invalid code", status_code=403)
+def extract_read_page(html: str, current_url: str, want_title: bool = True) -> dict:
+    """解析单个阅读页：标题、导航链接、正文文本与分页链接（在解析池中执行）"""
+    from bs4 import BeautifulSoup
+    with stage("parse"):
+        soup = BeautifulSoup(html, 'lxml')
+    extract_started = time.perf_counter()
+    page = {"title": "", "next_url": None, "prev_url": None, "toc_url": None, "next_page": None, "page_count": None}
+    if want_title:
+        page['title'] = clean_content_title(soup, soup.title.string if soup.title else "")
+    h1 = soup.find('h1')
+    for text in ((soup.title.string if soup.title else None) or "", h1.get_text() if h1 else ""):
+        m = _PAGE_COUNTER_RE.search(text)
+        if m and 0 < int(m.group(1)) <= int(m.group(2)):
+            page['page_count'] = int(m.group(2))
+            break
+
+    # 提取导航和目录
+    for a in soup.find_all('a'):
+        text = a.get_text(strip=True)
+        href = a.get('href')
+        if not href: continue
+        full_href = urllib.parse.urljoin(current_url, href)
+        if any(k in text for k in ['下一章', '下章节', 'Next']): page['next_url'] = full_href
+        if any(k in text for k in ['上一章', '上章节', 'Prev']): page['prev_url'] = full_href
+        if any(k in text for k in ['目录', 'Index', '返回列表', '返回书页']): page['toc_url'] = full_href
+
+    container = soup.find(id=['content', 'booktxt', 'chaptercontent', 'showtxt', 'nr', 'read-content', 'main-content'])
+    if not container:
+        container = soup.find(class_=['content', 'book-content', 'read-content', 'showtxt', 'post-content'])
     
+    target = container if container else soup.body if soup.body else soup
+    for junk in target(['script', 'style', 'iframe', 'header', 'footer', 'nav', 'aside', 'button', 'fieldset', 'h1', 'h2']):
+        junk.decompose()
+    
+    page['text'] = target.get_text(separator='\n')
+
+    # 分页：查找“下一页”
+    for a in soup.find_all('a'):
+        if any(k in a.get_text() for k in ['下一页', '下一頁']) and len(a.get_text()) < 8:
+            next_p = urllib.parse.urljoin(current_url, a.get('href'))
+            if next_p != current_url:
+                page['next_page'] = next_p
+                break
+    record_stage("extract", time.perf_counter() - extract_started)
+    return page
+
+async def load_read_page(url: str, attempts: int = 3) -> dict:
+    started = time.perf_counter()
+    html = await fetch_html_raw(url, attempts=attempts)
+    page = await run_in_pool(extract_read_page, html, url, host=urllib.parse.urlparse(url).netloc)
+    page['elapsed'] = time.perf_counter() - started
+    return page
+
+def infer_page_urls(first_url: str, second_url: str, last_page: int) -> Optional[List[str]]:
+    """根据第 1、2 页的 URL 推断分页规律，返回第 2..last_page 页的 URL；推断不出时返回 None"""
+    # 路径中的页码：123.html -> 123_2.html / 123-2.html / 123/2.html，或 list_1.html -> list_2.html
+    for m in reversed(list(_DIGITS_RE.finditer(second_url))):
+        if m.group() != '2': continue
+        prefix, suffix = second_url[:m.start()], second_url[m.end():]
+        if f"{prefix}1{suffix}" == first_url or (prefix[-1:] in ('_', '-', '/') and prefix[:-1] + suffix == first_url):
+            return [f"{prefix}{n}{suffix}" for n in range(2, last_page + 1)]
+    # 查询参数中的页码：?page=2，第 1 页可能不带该参数或为 1
+    first, second = urllib.parse.urlsplit(first_url), urllib.parse.urlsplit(second_url)
+    if first[:3] != second[:3]: return None
+    first_query = urllib.parse.parse_qsl(first.query, keep_blank_values=True)
+    second_query = urllib.parse.parse_qsl(second.query, keep_blank_values=True)
+    for key, value in second_query:
+        if value != '2': continue
+        others = [(k, v) for k, v in second_query if k != key]
+        if [(k, v) for k, v in first_query if not (k == key and v == '1')] != others: continue
+        return [
+            urllib.parse.urlunsplit(second._replace(query=urllib.parse.urlencode(
+                [(k, str(n) if k == key else v) for k, v in second_query])))
+            for n in range(2, last_page + 1)
+        ]
+    return None
+
+async def load_pages_parallel(first_url: str, first_page: dict) -> List[dict]:
+    """按推断出的分页规律并发抓取后续页面，返回与实际“下一页”链接一致的连续页面
+
+    页面标出总页数时只抓取这些页；否则每轮抓取已确认的下一页及其后 READ_SPECULATE_PAGES 页，
+    全部与实际链接相符且仍有下一页时再继续下一轮，不存在的页最多多请求 READ_SPECULATE_PAGES 次
+    """
+    last_page = min(first_page['page_count'] or READ_MAX_PAGES, READ_MAX_PAGES)
+    guesses = infer_page_urls(first_url, first_page['next_page'], last_page)
+    if not guesses: return []
+    STATS["read_pagination_guessed"] += 1
+    known_count = first_page['page_count'] is not None
+    pages, prev = [], first_page
+    while len(pages) < len(guesses):
+        start = len(pages)
+        # 第一个是页面上的真实链接；之后的页面是推测出来的，可能不存在，失败不重试
+        batch = guesses[start:] if known_count else guesses[start:start + 1 + READ_SPECULATE_PAGES]
+        results = await asyncio.gather(
+            *[load_read_page(u, attempts=3 if i == 0 else 1) for i, u in enumerate(batch)],
+            return_exceptions=True,
+        )
+        for guess, result in zip(batch, results):
+            if prev['next_page'] != guess or isinstance(result, BaseException): break
+            pages.append(result)
+            prev = result
+        if len(pages) < start + len(batch) or not prev['next_page']: break
+    if len(pages) < len(guesses) and prev['next_page']:
+        STATS["read_pagination_fallbacks"] += 1
+    return pages
+
+async def build_chapter(actual_url: str, prefetched: bool = False) -> dict:
+    """抓取并合并章节的所有分页，清洗正文后写入阅读页缓存"""
+    started = time.perf_counter()
+    pages = [await load_read_page(actual_url)]
+    if READ_PAGINATION == "parallel" and pages[0]['next_page']:
+        pages.extend(await load_pages_parallel(actual_url, pages[0]))
+    # 顺序翻页：未启用并行、推测失败或推测页与实际链接不符时，从最后一个确认的页面继续
+    while len(pages) < READ_MAX_PAGES and pages[-1]['next_page']:
+        pages.append(await load_read_page(pages[-1]['next_page']))
+    wall = time.perf_counter() - started
+    serial = sum(page['elapsed'] for page in pages)
+    STATS["read_pagination_saved_ms"] += int(max(serial - wall, 0) * 1000)
+
+    main_title = next((page['title'] for page in pages if page['title']), "")
+    next_url, prev_url, toc_url = None, None, None
+    for page in pages:
+        next_url = page['next_url'] or next_url
+        prev_url = page['prev_url'] or prev_url
+        toc_url = page['toc_url'] or toc_url
+    full_body_text = [page['text'] for page in pages]
+
+    final_html = await run_in_pool(process_pure_content, "\n".join(full_body_text), stage_name="clean",
+                                   host=urllib.parse.urlparse(actual_url).netloc)
+    # 分页耗时：serial 为逐页耗时之和，wall 为实际耗时，二者之差即并行抓取节省的时间
+    server_timing = (
+        f"read-pages;desc=\"{len(pages)} pages\", read-serial;dur={serial * 1000:.1f}, "
+        f"read-wall;dur={wall * 1000:.1f}, read-saved;dur={max(serial - wall, 0) * 1000:.1f}"
+    )
+    chapter = {
+        "title": main_title, "html": final_html, "next_url": next_url, "prev_url": prev_url, "toc_url": toc_url,
+        "server_timing": server_timing, "prefetched": prefetched, "built_at": time.time(),
+    }
+    reader_cache.set(actual_url, chapter, sys.getsizeof(final_html))
+    return chapter
+
+async def prefetch_chapters(next_url: str, client: str):
+    """返回页面后在后台预取后续章节，每个客户端同时只允许有限数量的预取"""
+    if _prefetch_clients[client] >= READ_PREFETCH_PER_CLIENT:
+        STATS["read_prefetch_skipped"] += 1
+        return
+    _prefetch_clients[client] += 1
     try:
-        actual_url = url_decode_proxy(url) if not url.startswith("http") else url
-        full_body_text = []
-        current_url = actual_url
-        pages_fetched = 0
-        next_url, prev_url, toc_url = None, None, None
-        main_title = ""
-
-        while pages_fetched < 5:
-            html, _ = await fetch_html_raw(current_url)
-            soup = BeautifulSoup(html, 'lxml')
-            if not main_title:
-                main_title = clean_content_title(soup, soup.title.string if soup.title else "")
-
-            # 提取导航和目录
-            for a in soup.find_all('a'):
-                text = a.get_text(strip=True)
-                href = a.get('href')
-                if not href: continue
-                full_href = urllib.parse.urljoin(current_url, href)
-                if any(k in text for k in ['下一章', '下章节', 'Next']): next_url = full_href
-                if any(k in text for k in ['上一章', '上章节', 'Prev']): prev_url = full_href
-                if any(k in text for k in ['目录', 'Index', '返回列表', '返回书页']): toc_url = full_href
-
-            container = soup.find(id=['content', 'booktxt', 'chaptercontent', 'showtxt', 'nr', 'read-content', 'main-content'])
-            if not container:
-                container = soup.find(class_=['content', 'book-content', 'read-content', 'showtxt', 'post-content'])
+        for _ in range(READ_PREFETCH_DEPTH):
+            chapter = reader_cache.get(next_url)
+            if chapter is None or time.time() - chapter['built_at'] >= READ_CACHE_TTL:
+                chapter = await read_flight.do(next_url, build_chapter, next_url, True)
+                STATS["read_prefetched"] += 1
+            next_url = chapter['next_url']
+            if not next_url: break
+    except Exception:
+        STATS["read_prefetch_errors"] += 1
+    finally:
+        _prefetch_clients[client] -= 1
+        if _prefetch_clients[client] <= 0: del _prefetch_clients[client]
+
+def render_reader(chapter: dict, code: str) -> str:
+    main_title, final_html = chapter['title'], chapter['html']
+    next_url, prev_url, toc_url = chapter['next_url'], chapter['prev_url'], chapter['toc_url']
+
+    def get_read_link(target_url):
+        if not target_url: return "#"
+        return f"/read?url={url_encode_proxy(target_url)}&code={code}"
+
+    html_template = f"""
+    <!DOCTYPE html>
+    <html lang="zh-CN">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
+        <title>{main_title}</title>
+        <script src="https://cdn.tailwindcss.com"></script>
+        <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
+        <style>
+            @import url('https://fonts.googleapis.com/css2?family=Noto+Serif+SC:wght@400;700&display=swap');
+            :root {{ --bg-color: #f2efea; --text-color: #262626; --font-size: 1.25rem; }}
+            body {{ 
+                background-color: var(--bg-color); color: var(--text-color); 
+                font-family: "Noto Serif SC", serif; transition: background-color 0.3s, color 0.3s;
+                -webkit-font-smoothing: antialiased; line-height: 1.85;
+            }}
+            .reader-container {{ max-width: 780px; margin: 0 auto; padding: 2rem 1.25rem 10rem; }}
+            h1 {{ font-size: 1.9rem; font-weight: 700; margin-bottom: 4rem; text-align: center; color: #000; line-height: 1.4; }}
+            #content p {{ 
+                margin-bottom: 1.7rem; line-height: 2.1; text-indent: 2em; 
+                font-size: var(--font-size); text-align: justify; word-break: break-all;
+            }}
+            .dark-mode {{ --bg-color: #181818; --text-color: #b0b0b0; }}
+            .dark-mode h1 {{ color: #efefef; }}
+            .nav-btn {{ 
+                @apply px-5 py-3 rounded-xl transition-all flex items-center space-x-2 text-sm font-medium;
+                border: 1px solid rgba(0,0,0,0.08); color: #666;
+            }}
+            .nav-btn:hover {{ background: rgba(0,0,0,0.03); color: #000; border-color: rgba(0,0,0,0.15); }}
             
-            target = container if container else soup.body if soup.body else soup
-            for junk in target(['script', 'style', 'iframe', 'header', 'footer', 'nav', 'aside', 'button', 'fieldset', 'h1', 'h2']):
-                junk.decompose()
+            .nav-btn-next {{ 
+                @apply bg-slate-800 !text-white !border-none px-8;
+            }}
+            .nav-btn-next:hover {{ @apply bg-black shadow-lg; }}
             
-            full_body_text.append(target.get_text(separator='\n'))
-
-            # 分页逻辑
-            has_next_page = False
-            for a in soup.find_all('a'):
-                if any(k in a.get_text() for k in ['下一页', '下一頁']) and len(a.get_text()) < 8:
-                    next_p = urllib.parse.urljoin(current_url, a.get('href'))
-                    if next_p != current_url:
-                        current_url = next_p
-                        has_next_page = True
-                        break
-            if has_next_page: pages_fetched += 1
-            else: break
-
-        final_html = process_pure_content("\n".join(full_body_text))
-
-        def get_read_link(target_url):
-            if not target_url: return "#"
-            return f"/read?url={url_encode_proxy(target_url)}&code={code}"
-
-        html_template = f"""
-        <!DOCTYPE html>
-        <html lang="zh-CN">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-            <title>{main_title}</title>
-            <script src="https://cdn.tailwindcss.com"></script>
-            <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
-            <style>
-                @import url('https://fonts.googleapis.com/css2?family=Noto+Serif+SC:wght@400;700&display=swap');
-                :root {{ --bg-color: #f2efea; --text-color: #262626; --font-size: 1.25rem; }}
-                body {{ 
-                    background-color: var(--bg-color); color: var(--text-color); 
-                    font-family: "Noto Serif SC", serif; transition: background-color 0.3s, color 0.3s;
-                    -webkit-font-smoothing: antialiased; line-height: 1.85;
-                }}
-                .reader-container {{ max-width: 780px; margin: 0 auto; padding: 2rem 1.25rem 10rem; }}
-                h1 {{ font-size: 1.9rem; font-weight: 700; margin-bottom: 4rem; text-align: center; color: #000; line-height: 1.4; }}
-                #content p {{ 
-                    margin-bottom: 1.7rem; line-height: 2.1; text-indent: 2em; 
-                    font-size: var(--font-size); text-align: justify; word-break: break-all;
-                }}
-                .dark-mode {{ --bg-color: #181818; --text-color: #b0b0b0; }}
-                .dark-mode h1 {{ color: #efefef; }}
-                .nav-btn {{ 
-                    @apply px-5 py-3 rounded-xl transition-all flex items-center space-x-2 text-sm font-medium;
-                    border: 1px solid rgba(0,0,0,0.08); color: #666;
-                }}
-                .nav-btn:hover {{ background: rgba(0,0,0,0.03); color: #000; border-color: rgba(0,0,0,0.15); }}
-                
-                .nav-btn-next {{ 
-                    @apply bg-slate-800 !text-white !border-none px-8;
-                }}
-                .nav-btn-next:hover {{ @apply bg-black shadow-lg; }}
-                
-                .dark-mode .nav-btn {{ 
-                    border-color: rgba(255,255,255,0.1); color: #999;
-                }}
-                .dark-mode .nav-btn:hover {{ background: rgba(255,255,255,0.05); color: #fff; }}
-                .dark-mode .nav-btn-next {{ @apply bg-indigo-600 !text-white; }}
-                
-                .progress-bar {{ position: fixed; top: 0; left: 0; height: 3px; background: #6366f1; transition: width 0.2s; z-index: 100; }}
-            </style>
-        </head>
-        <body class="selection:bg-indigo-200">
-            <div class="progress-bar" id="progressBar"></div>
-            <div class="reader-container">
-                <h1>{main_title}</h1>
-                <div id="content">{final_html}</div>
-                <div class="mt-20 flex justify-between items-center border-t pt-10 border-gray-300/20">
-                    <a href="{get_read_link(prev_url)}" class="nav-btn {'opacity-20 pointer-events-none' if not prev_url else ''}">
-                        <i class="fas fa-chevron-left text-[10px]"></i> <span>上一项</span>
-                    </a>
-                    <a href="{get_read_link(next_url)}" class="nav-btn nav-btn-next {'opacity-20 pointer-events-none' if not next_url else ''}">
-                        <span>下一项</span> <i class="fas fa-chevron-right text-[10px]"></i>
-                    </a>
-                </div>
-            </div>
-            <div class="fixed bottom-8 right-6 flex flex-col space-y-4 z-50">
-                <a href="{toc_url if toc_url else '#'}" class="w-12 h-12 rounded-full bg-white shadow-lg border border-gray-100 flex items-center justify-center text-slate-600 active:scale-95 {'hidden' if not toc_url else ''}">
-                    <i class="fas fa-list-ul"></i>
+            .dark-mode .nav-btn {{ 
+                border-color: rgba(255,255,255,0.1); color: #999;
+            }}
+            .dark-mode .nav-btn:hover {{ background: rgba(255,255,255,0.05); color: #fff; }}
+            .dark-mode .nav-btn-next {{ @apply bg-indigo-600 !text-white; }}
+            
+            .progress-bar {{ position: fixed; top: 0; left: 0; height: 3px; background: #6366f1; transition: width 0.2s; z-index: 100; }}
+        </style>
+    </head>
+    <body class="selection:bg-indigo-200">
+        <div class="progress-bar" id="progressBar"></div>
+        <div class="reader-container">
+            <h1>{main_title}</h1>
+            <div id="content">{final_html}</div>
+            <div class="mt-20 flex justify-between items-center border-t pt-10 border-gray-300/20">
+                <a href="{get_read_link(prev_url)}" class="nav-btn {'opacity-20 pointer-events-none' if not prev_url else ''}">
+                    <i class="fas fa-chevron-left text-[10px]"></i> <span>上一项</span>
+                </a>
+                <a href="{get_read_link(next_url)}" class="nav-btn nav-btn-next {'opacity-20 pointer-events-none' if not next_url else ''}">
+                    <span>下一项</span> <i class="fas fa-chevron-right text-[10px]"></i>
                 </a>
-                <button onclick="changeFontSize(1)" class="w-12 h-12 rounded-full bg-white shadow-lg border border-gray-100 flex items-center justify-center text-slate-600 active:scale-95"><i class="fas fa-plus"></i></button>
-                <button onclick="changeFontSize(-1)" class="w-12 h-12 rounded-full bg-white shadow-lg border border-gray-100 flex items-center justify-center text-slate-600 active:scale-95"><i class="fas fa-minus"></i></button>
-                <button onclick="toggleDarkMode()" class="w-12 h-12 rounded-full bg-slate-800 text-white shadow-lg flex items-center justify-center active:scale-95"><i class="fas fa-circle-half-stroke"></i></button>
             </div>
-            <script>
-                window.onscroll = function() {{
-                    let winScroll = document.body.scrollTop || document.documentElement.scrollTop;
-                    let height = document.documentElement.scrollHeight - document.documentElement.clientHeight;
-                    let scrolled = (winScroll / height) * 100;
-                    document.getElementById("progressBar").style.width = scrolled + "%";
-                }};
-                let fontSize = parseFloat(localStorage.getItem('readerFontSize') || 1.25);
-                function updateStyle() {{ document.documentElement.style.setProperty('--font-size', fontSize + 'rem'); localStorage.setItem('readerFontSize', fontSize); }}
-                function changeFontSize(delta) {{ fontSize = Math.max(0.85, Math.min(2.5, fontSize + delta * 0.1)); updateStyle(); }}
-                function toggleDarkMode() {{ document.body.classList.toggle('dark-mode'); localStorage.setItem('darkMode', document.body.classList.contains('dark-mode')); }}
-                if (localStorage.getItem('darkMode') === 'true') document.body.classList.add('dark-mode');
-                updateStyle();
-            </script>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_template)
+        </div>
+        <div class="fixed bottom-8 right-6 flex flex-col space-y-4 z-50">
+            <a href="{toc_url if toc_url else '#'}" class="w-12 h-12 rounded-full bg-white shadow-lg border border-gray-100 flex items-center justify-center text-slate-600 active:scale-95 {'hidden' if not toc_url else ''}">
+                <i class="fas fa-list-ul"></i>
+            </a>
+            <button onclick="changeFontSize(1)" class="w-12 h-12 rounded-full bg-white shadow-lg border border-gray-100 flex items-center justify-center text-slate-600 active:scale-95"><i class="fas fa-plus"></i></button>
+            <button onclick="changeFontSize(-1)" class="w-12 h-12 rounded-full bg-white shadow-lg border border-gray-100 flex items-center justify-center text-slate-600 active:scale-95"><i class="fas fa-minus"></i></button>
+            <button onclick="toggleDarkMode()" class="w-12 h-12 rounded-full bg-slate-800 text-white shadow-lg flex items-center justify-center active:scale-95"><i class="fas fa-circle-half-stroke"></i></button>
+        </div>
+        <script>
+            window.onscroll = function() {{
+                let winScroll = document.body.scrollTop || document.documentElement.scrollTop;
+                let height = document.documentElement.scrollHeight - document.documentElement.clientHeight;
+                let scrolled = (winScroll / height) * 100;
+                document.getElementById("progressBar").style.width = scrolled + "%";
+            }};
+            let fontSize = parseFloat(localStorage.getItem('readerFontSize') || 1.25);
+            function updateStyle() {{ document.documentElement.style.setProperty('--font-size', fontSize + 'rem'); localStorage.setItem('readerFontSize', fontSize); }}
+            function changeFontSize(delta) {{ fontSize = Math.max(0.85, Math.min(2.5, fontSize + delta * 0.1)); updateStyle(); }}
+            function toggleDarkMode() {{ document.body.classList.toggle('dark-mode'); localStorage.setItem('darkMode', document.body.classList.contains('dark-mode')); }}
+            if (localStorage.getItem('darkMode') === 'true') document.body.classList.add('dark-mode');
+            updateStyle();
+        </script>
+    </body>
+    </html>
+    """
+    return html_template
+
+@app.get("/read")
+async def read_clean(request: Request, background_tasks: BackgroundTasks, url: str, code: str, job: bool = False):
+    if code != VERIFICATION_CODE:
+        return HTMLResponse("Invalid code", status_code=403)
+    
+    try:
+        actual_url = url_decode_proxy(url) if not url.startswith("http") else url
+        chapter = reader_cache.get(actual_url)
+        headers = {}
+        if chapter and time.time() - chapter['built_at'] < READ_CACHE_TTL:
+            count("read_cache_hits")
+            if chapter['prefetched']:
+                STATS["read_prefetch_used"] += 1
+                chapter['prefetched'] = False
+            server_timing = 'read-cache;desc="hit"'
+        elif job:
+            # 异步模式：后台构建，期间返回旧结果或自动刷新的等待页
+            count("read_cache_misses")
+            queued = await job_queue.submit("read", actual_url, read_flight.do, actual_url, build_chapter, actual_url)
+            if chapter:
+                count("read_stale_served")
+                headers = {**STALE_HEADERS, "X-Job-Id": queued['id']}
+            else:
+                queued = await job_queue.wait(queued, JOB_WAIT)
+                if queued['status'] == "failed": raise HTTPException(status_code=queued['error_status'], detail=queued['error'])
+                if queued['status'] != "done":
+                    return HTMLResponse(
+                        "<html><head><meta charset='utf-8'><meta http-equiv='refresh' content='3'></head>"
+                        "<body><div style='padding:2rem;'><h3>正在加载</h3><p>页面将自动刷新</p></div></body></html>",
+                        status_code=202, headers=job_headers(queued, code))
+                chapter = queued['_result']
+            server_timing = 'read-cache;desc="stale"' if headers else chapter['server_timing']
+        else:
+            count("read_cache_misses")
+            chapter = await read_flight.do(actual_url, build_chapter, actual_url)
+            server_timing = chapter['server_timing']
+
+        # 读者几乎总会点“下一项”，响应发出后在后台预取
+        if READ_PREFETCH_DEPTH > 0 and chapter['next_url']:
+            background_tasks.add_task(prefetch_chapters, chapter['next_url'], request.client.host if request.client else "")
+        return HTMLResponse(content=render_reader(chapter, code), headers={"Server-Timing": server_timing, **headers})
+    except HTTPException as e:
+        if e.status_code != 503: return HTMLResponse(f"<div style='padding:2rem;'><h3>解析失败</h3><p>{e.detail}</p></div>", status_code=500)
+        return HTMLResponse("<div style='padding:2rem;'><h3>服务繁忙</h3><p>请稍后重试</p></div>", status_code=503, headers=e.headers)
     except Exception as e:
         return HTMLResponse(f"<div style='padding:2rem;'><h3>解析失败</h3><p>{str(e)}</p></div>", status_code=500)
 
+# 规则识别：内容类链接文字的特征合并成一个正则；父容器只统计前 DETECT_SAMPLE 个匹配的链接
+_DETECT_CONTENT_RE = re.compile(r'第.*?[章节节回集话卷]|Chapter|分卷|番外|正文|BD|HD|720p|1080p|迅雷下载|磁力下载', re.I)
+DETECT_SAMPLE = 100
+_MAGNET_RULE = {"a": 'a[href^="magnet:"]', "t": "a[href^='magnet:']", "attr": "href", "message": "Detected media links."}
+
+def parent_selector(name: str, id_: Optional[str], classes: List[str]) -> str:
+    # 父级标签名及其 id/class
+    return name + (f"#{id_}" if id_ else "") + (f".{'.'.join(classes)}" if classes else "")
+
+def detect_from_html(html_content: str, url: str) -> dict:
+    """根据页面链接特征推断选择器规则（在解析池中执行）"""
+    import lxml.html
+    with stage("parse"):
+        try:
+            tree = lxml.html.document_fromstring(html_content)
+            anchors = tree.xpath('//a[@href]')
+        except Exception:
+            tree, anchors = None, []
+        if anchors:
+            if tree.xpath('boolean(//a[starts-with(@href, "magnet:")])'): return dict(_MAGNET_RULE)
+            text_of = lxml_text
+            def parent_of(el):
+                p = el.getparent()
+                return parent_selector(p.tag, p.get('id'), (p.get('class') or '').split()) if p is not None else None
+        else:
+            # lxml 找不到链接时才用 html.parser 重新解析
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(html_content, 'html.parser')
+            anchors = soup.find_all('a', href=True)
+            if soup.select('a[href^="magnet:"]'): return dict(_MAGNET_RULE)
+            text_of = lambda el: el.get_text(strip=True)
+            def parent_of(el):
+                p = el.parent
+                return parent_selector(p.name, p.get('id'), p.get('class') or []) if p is not None else None
+
+    if not anchors:
+        print(f"DEBUG: No links found for {url}. Length: {len(html_content)}. Snippet: {html_content[:500]}")
+        return {"error": "No links found on the page. Site might be blocking requests or requires JavaScript."}
+    with stage("detect"):
+        return detect_from_anchors(anchors, text_of, parent_of)
+
+def detect_from_anchors(anchors: list, text_of, parent_of) -> dict:
+    """单次遍历链接：统计内容类链接及其父容器，结果确定后提前结束"""
+    parents: Counter = Counter()
+    matched = sampled = 0
+    complete = True
+    for el in anchors:
+        if not _DETECT_CONTENT_RE.search(text_of(el)): continue
+        matched += 1
+        if sampled >= DETECT_SAMPLE:
+            # 样本已满，领先者与降级判断（matched > 20）都已确定
+            complete = False
+            break
+        sampled += 1
+        sel = parent_of(el)
+        if sel: parents[sel] += 1
+        # 领先优势超过样本窗口的剩余名额，且领先者已不少于 5 项：结果不会再变
+        top = parents.most_common(2)
+        if top and top[0][1] >= 5 and matched > 1:
+            lead = top[0][1] - (top[1][1] if len(top) > 1 else 0)
+            if lead > DETECT_SAMPLE - sampled:
+                complete = False
+                break
+
+    if matched > 1 and parents:
+        best_parent, best_count = parents.most_common(1)[0]
+        # 如果最常见的父级包含项太少，尝试使用不带特定类的通用选择器
+        if best_count < 5 and matched > 20:
+            best_parent = "a" # 降级为全局 a 标签匹配，由 novel 模式过滤
+        rule = f"{best_parent} a" if best_parent != "a" else "a"
+        found = f"{matched} items" if complete else f"at least {matched} items"
+        return {"a": rule, "t": rule, "attr": "href", "novel": True, "message": f"Detected novel pattern with {found}."}
+
+    return {"error": "Could not detect patterns. Found " + str(len(anchors)) + " total links, but none match content patterns."}
+
 @app.get("/detect")
 async def detect_rules(url: str = Query(...), code: str = Query(...), charset: Optional[str] = None):
     if code != VERIFICATION_CODE: return {"error": "Invalid verification code"}
     try:
-        html_content, _ = await fetch_html_raw(url, charset=charset)
-        soup = BeautifulSoup(html_content, 'lxml')
-        all_links = soup.find_all('a', href=True)
-        
-        # Fallback to html.parser
-        if not all_links:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            all_links = soup.find_all('a', href=True)
-
-        if not all_links:
-            print(f"DEBUG: No links found for {url}. Length: {len(html_content)}. Snippet: {html_content[:500]}")
-            return {"error": "No links found on the page. Site might be blocking requests or requires JavaScript."}
-
-        magnets = soup.select('a[href^="magnet:"]')
-        if magnets:
-            return {"a": 'a[href^="magnet:"]', "t": "a[href^='magnet:']", "attr": "href", "message": "Detected media links."}
-        
-        # 增加更多常见的资源类关键词
-        content_patterns = [r'第.*?[章节节回集话卷]', r'Chapter', r'分卷', r'番外', r'正文', r'BD', r'HD', r'720p', r'1080p', r'迅雷下载', r'磁力下载']
-        novel_links = []
-        for l in all_links:
-            text = l.get_text(strip=True)
-            if any(re.search(p, text, re.I) for p in content_patterns):
-                novel_links.append(l)
-        
-        if len(novel_links) > 1:
-            from collections import Counter
-            parents = Counter()
-            # 增加检查范围，以便在大型列表中更准确地识别容器
-            for l in novel_links[:100]: 
-                p = l.parent
-                if not p: continue
-                # 获取父级标签名及其 class/id
-                classes = p.get('class')
-                class_str = f".{'.'.join(classes)}" if classes else ""
-                id_str = f"#{p.get('id')}" if p.get('id') else ""
-                sel = p.name + id_str + class_str
-                parents[sel] += 1
-            
-            best_parent = parents.most_common(1)[0][0]
-            # 如果最常见的父级包含项太少，尝试使用不带特定类的通用选择器
-            if parents.most_common(1)[0][1] < 5 and len(novel_links) > 20:
-                 best_parent = "a" # 降级为全局 a 标签匹配，由 novel 模式过滤
-            
-            return {
-                "a": f"{best_parent} a" if best_parent != "a" else "a", 
-                "t": f"{best_parent} a" if best_parent != "a" else "a", 
-                "attr": "href", 
-                "novel": True,
-                "message": f"Detected novel pattern with {len(novel_links)} items."
-            }
-            
-        return {"error": "Could not detect patterns. Found " + str(len(all_links)) + " total links, but none match content patterns."}
+        # 与 /html2rss 默认参数共用上游缓存键（charset 缺省即 auto），识别后的预览无需再次抓取
+        html_content = await fetch_html_raw(url, charset=charset or "auto")
+        return await run_in_pool(detect_from_html, html_content, url, host=urllib.parse.urlparse(url).netloc)
     except HTTPException as e:
+        if e.status_code == 503: raise
         return {"error": f"HTTP {e.status_code}: {e.detail}"}
     except Exception as e: 
         return {"error": str(e)}
 
+_EPISODE_KEYWORD_RE = re.compile(r'第\s*(\d+)\s*[集话期P]')
+_EPISODE_DELIMITED_RE = re.compile(r'(?:[\s\-\[\]\(_]|^)(\d+)(?:v\d+)?(?:[\s\-\[\]\)_]|$|\.[a-z0-9]{2,4})', re.I)
+_EPISODE_TRAILING_RE = re.compile(r'(\d+)(?:v\d+)?(?:\.[a-z0-9]{2,4})?$', re.I)
+_EPISODE_NUMBER_RE = re.compile(r'(\d+)(?:v\d+)?', re.I)
+_SPACES_RE = re.compile(r'\s+')
+
 def format_episode_title(title: str, season: Optional[int]) -> str:
     if season is None: return title
     
     # 更激进地匹配集数：支持 "13", "第13集", "13.mp4", " - 13", "[13]"
     # 1. 匹配“第xx集/话/P”
-    match = re.search(r'第\s*(\d+)\s*[集话期P]', title)
+    match = _EPISODE_KEYWORD_RE.search(title)
     
     # 2. 匹配被空格、中划线、方括号包裹的数字，或文件名结尾前的数字
     if not match:
         # 匹配如 " - 13", "[13]", " 13 ", "_13_", "06v2.mp4"
         # 增加了对 v[0-9] 后缀的识别
-        match = re.search(r'(?:[\s\-\[\]\(_]|^)(\d+)(?:v\d+)?(?:[\s\-\[\]\)_]|$|\.[a-z0-9]{2,4})', title, re.I)
+        match = _EPISODE_DELIMITED_RE.search(title)
     
     # 3. 实在不行，匹配末尾的数字
     if not match:
-        match = re.search(r'(\d+)(?:v\d+)?(?:\.[a-z0-9]{2,4})?$', title, re.I)
+        match = _EPISODE_TRAILING_RE.search(title)
         
     if match:
         try:
@@ -449,7 +1787,7 @@ def format_episode_title(title: str, season: Optional[int]) -> str:
             # 我们要替换的是包含数字及其可能版本号的整个部分
             # 但由于 match.group(0) 包含了周围的边界字符，我们需要精确找到要替换的文本
             # 重新构造一个正则来精确捕获包含数字和可选 v2 的部分
-            replace_match = re.search(r'(\d+)(?:v\d+)?', match.group(0), re.I)
+            replace_match = _EPISODE_NUMBER_RE.search(match.group(0))
             if replace_match:
                 to_replace = replace_match.group(0)
                 # 寻找这个片段在原标题中相对于当前 match 的位置
@@ -466,15 +1804,500 @@ def format_episode_title(title: str, season: Optional[int]) -> str:
             if "第" in full_match or any(k in full_match for k in ["集", "话", "P"]):
                 new_title = title.replace(full_match, f" {s_str} ")
 
-            return re.sub(r'\s+', ' ', new_title).strip()
+            return _SPACES_RE.sub(' ', new_title).strip()
         except:
             pass
     return title
 
+_DIGITS_SPLIT_RE = re.compile(r'(\d+)')
+_DIGITS_RE = re.compile(r'\d+')
+
 def natural_sort_key(text: str) -> list:
     # 去除所有空白字符后再进行分块，确保排序不受空格干扰
-    clean_text = re.sub(r'[\s\u3000\xa0]+', '', text)
-    return [int(c) if c.isdigit() else c.lower() for c in re.split(r'(\d+)', clean_text) if c]
+    clean_text = _WHITESPACE_RE.sub('', text)
+    # 数字块与文本块分别打上类型标记，“12. 标题”与“第1章”这类首块类型不同的标题之间也能比较
+    return [(0, int(c), "") if c.isdigit() else (1, 0, c.lower()) for c in _DIGITS_SPLIT_RE.split(clean_text) if c]
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match: return False
+    if if_none_match.strip() == '*': return True
+    # 弱比较：忽略 W/ 前缀
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return etag.removeprefix('W/') in tags
+
+_URL_CONTROL_RE = re.compile(r'[\r\n\t]+')
+_NOVEL_CHAPTER_RE = re.compile(r'第.*?[章节节回集话卷]|Chapter\s*\d+|^\d+[\s\.]+', re.I)
+_NOVEL_KEYWORD_RE = re.compile(r'(第.*?[章节节回集话卷])')
+_NOVEL_CHAPTER_EN_RE = re.compile(r'(Chapter\d+)', re.I)
+
+@functools.lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def split_selectors(selectors: Optional[str]) -> Tuple[str, ...]:
+    # 支持逗号分隔的多选择器
+    return tuple(sel.strip() for sel in selectors.split(',')) if selectors else ()
+
+@functools.lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def compile_css(sel: str) -> "CSSSelector":
+    from lxml.cssselect import CSSSelector
+    return CSSSelector(sel, translator='html')
+
+@functools.lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def compile_soup_css(sel: str):
+    import soupsieve
+    return soupsieve.compile(sel)
+
+def select_nodes_bs4(html: str, params: dict, page: Optional[dict] = None) -> tuple:
+    from bs4 import BeautifulSoup
+    soup = page.get('soup') if page is not None else None
+    if soup is None:
+        with stage("parse"):
+            soup = BeautifulSoup(html, 'lxml')
+        if page is not None: page['soup'] = soup
+    links, titles = [], []
+    with stage("select"):
+        for sel in split_selectors(params['a']):
+            links.extend(compile_soup_css(sel).select(soup))
+        for sel in split_selectors(params['t']):
+            titles.extend(compile_soup_css(sel).select(soup))
+    page_title = soup.title.string if soup.title else params['url']
+    return page_title, links, titles, lambda el: el.get_text(strip=True)
+
+# BeautifulSoup 的 get_text 不包含这些标签内的文字
+_BS4_SKIP_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+def lxml_text(el) -> str:
+    """与 BeautifulSoup get_text(strip=True) 结果一致的 lxml 文本提取"""
+    if el.tag not in _BS4_SKIP_TEXT_TAGS and any(p.tag in _BS4_SKIP_TEXT_TAGS for p in el.iterancestors()):
+        return ""
+    parts = []
+    def walk(node):
+        if node.text: parts.append(node.text.strip())
+        for child in node:
+            if isinstance(child.tag, str) and child.tag not in _BS4_SKIP_TEXT_TAGS: walk(child)
+            if child.tail: parts.append(child.tail.strip())
+    walk(el)
+    return "".join(parts)
+
+def select_nodes_lxml(html: str, params: dict, page: Optional[dict] = None) -> tuple:
+    """直接在 lxml 树上执行 CSS 选择器，跳过 BeautifulSoup 建树；page 用于在多组规则间复用已解析的树"""
+    import lxml.html
+    tree = page.get('tree') if page is not None else None
+    if tree is None:
+        with stage("parse"):
+            tree = lxml.html.document_fromstring(html)
+        if page is not None: page['tree'] = tree
+    links, titles = [], []
+    with stage("select"):
+        for sel in split_selectors(params['a']):
+            links.extend(compile_css(sel)(tree))
+        for sel in split_selectors(params['t']):
+            titles.extend(compile_css(sel)(tree))
+    title_el = tree.find('.//title')
+    page_title = title_el.text if title_el is not None else params['url']
+    return page_title, links, titles, lxml_text
+
+def normalize_item(link_tag, title_tag, text_of, params: dict, base_url: str) -> Optional[Tuple[str, dict]]:
+    """单个条目的链接与标题规范化；返回 (用于去重的链接, 条目)，应跳过时返回 None"""
+    url, attr, season = params['url'], params['attr'], params['season']
+    # 容错：尝试多个可能的属性
+    raw_href = None
+    for attr_name in [attr or "href", "data-href", "data-url", "original-href"]:
+        raw_href = link_tag.get(attr_name)
+        if raw_href: break
+    
+    if not raw_href: return None
+    
+    try:
+        # 彻底清洗 URL 中的首尾空格及中间的换行
+        l_url = urllib.parse.urljoin(url, raw_href.strip())
+        l_url = _URL_CONTROL_RE.sub('', l_url)
+    except Exception:
+        return None
+    
+    # 容错：标题提取逻辑增强
+    title = text_of(title_tag)
+    if not title:
+        title = title_tag.get("title") or title_tag.get("alt") or "无标题"
+    
+    # 小说模式过滤与去空格
+    if params['novel']:
+        # 匹配“第xx章/节/回/集/话/卷”或“Chapter xx”或“数字. ”开头等模式
+        if not _NOVEL_CHAPTER_RE.search(title):
+            return None
+        # 小说模式下先去除标题中的各种空白字符
+        title = _WHITESPACE_RE.sub('', title)
+        # 在章节关键字（第...章/节/回/集/话/卷）后面加一个空格，增加可读性
+        title = _NOVEL_KEYWORD_RE.sub(r'\1 ', title)
+        # 处理 Chapter 格式
+        title = _NOVEL_CHAPTER_EN_RE.sub(r'\1 ', title)
+        title = title.strip()
+
+    link = l_url
+    if link.startswith("magnet:"): 
+        dn = extract_magnet_dn(link)
+        if dn: title = dn
+    
+    if season is not None:
+        title = format_episode_title(title, int(season))
+    
+    if params['clean'] and not link.startswith("magnet:"):
+        link = f"{base_url}/read?url={url_encode_proxy(link)}&code={params['code']}"
+    
+    return l_url, {"title": title, "link": link}
+
+def novel_items(links: list, titles: list, text_of, engine: str, params: dict, base_url: str) -> List[dict]:
+    """小说模式的条目列表：目录区与上次完全相同时直接复用排好序的结果，否则只有新出现的章节走标题规范化，
+    已有章节沿用上次的结果与排序键；设置了 NOVEL_RECENT_ITEMS 时只保留目录中最靠后的这些章
+
+    标题排序键在中文数字标题上并不可靠（只是按字符排序），截取窗口因此按目录顺序：
+    各章取在目录中最后一次出现的位置，页首“最新章节”区重复列出的章节按其在正文卷中的位置计"""
+    if engine == "lxml":
+        import lxml.etree
+        raw_of = functools.partial(lxml.etree.tostring, with_tail=False)
+    else:
+        raw_of = lambda el: str(el).encode()
+    # 每个条目以链接（及标题）节点的原始 HTML 为键，目录区指纹由全部键按顺序得出
+    raws = [raw_of(l) if l is t else raw_of(l) + b"\0" + raw_of(t) for l, t in zip(links, titles)]
+    fingerprint = hashlib.sha1(b"\0\0".join(raws)).digest()
+    memo_key = (engine, feed_cache_key(params, base_url))
+    with _novel_memo_lock:
+        memo = novel_memo.get(memo_key)
+    if memo and memo['fingerprint'] == fingerprint:
+        STATS["novel_memo_hits"] += 1
+        items, positions = memo['items'], memo['positions']
+    else:
+        known = memo['entries'] if memo else {}
+        entries: Dict[bytes, Optional[tuple]] = {}
+        ordered, last_seen, fresh = [], {}, 0
+        for index, (raw, link_tag, title_tag) in enumerate(zip(raws, links, titles)):
+            if raw in entries: entry = entries[raw]
+            elif raw in known: entry = entries[raw] = known[raw]
+            else:
+                entry = normalize_item(link_tag, title_tag, text_of, params, base_url)
+                if entry is not None: entry = (*entry, natural_sort_key(entry[1]['title']))
+                entries[raw] = entry
+                fresh += 1
+            if entry is None: continue
+            if entry[0] not in last_seen: ordered.append(entry)
+            last_seen[entry[0]] = index
+        # 按照章节标题进行自然排序（降序，即最新章节在前）；排序键已缓存，目录基本有序时 Timsort 接近线性
+        ordered.sort(key=lambda e: e[2], reverse=True)
+        items = [e[1] for e in ordered]
+        # 各条目在目录中的名次（0 为最靠后），供截取最新章节使用
+        rank = {url: n for n, url in enumerate(sorted(last_seen, key=last_seen.get, reverse=True))}
+        positions = [rank[e[0]] for e in ordered]
+        STATS["novel_memo_partial" if memo else "novel_memo_misses"] += 1
+        STATS["novel_items_normalized"] += fresh
+        with _novel_memo_lock:
+            novel_memo.set(memo_key, {"fingerprint": fingerprint, "entries": entries, "items": items,
+                                      "positions": positions}, sum(len(raw) + 300 for raw in raws))
+    if NOVEL_RECENT_ITEMS <= 0 or NOVEL_RECENT_ITEMS >= len(items): return list(items)
+    return [item for item, rank in zip(items, positions) if rank < NOVEL_RECENT_ITEMS]
+
+def extract_feed(html: str, params: dict, base_url: str, engine: Optional[str] = None, page: Optional[dict] = None) -> dict:
+    """解析页面并提取条目列表；engine 为空时按 FEED_ENGINE 选择，lxml 失败回退 bs4"""
+    ts, as_, novel = params['ts'], params['as'], params['novel']
+
+    wanted, engine = engine or FEED_ENGINE, "bs4"
+    if wanted == "lxml":
+        try:
+            page_title, links, titles, text_of = select_nodes_lxml(html, params, page)
+            if links: engine = "lxml"
+        except Exception:
+            pass
+    # lxml 无法处理的页面或选择器回退到 BeautifulSoup
+    if engine == "bs4":
+        page_title, links, titles, text_of = select_nodes_bs4(html, params, page)
+        
+    if not links: return {"status": 400, "detail": "No links found"}
+    
+    if not titles or len(titles) != len(links): titles = links
+    extract_started = time.perf_counter()
+
+    # Basic Sorting
+    if as_ == 'd': links = links[::-1]
+    if ts == 'd': titles = titles[::-1]
+
+    if novel:
+        item_list = novel_items(links, titles, text_of, engine, params, base_url)
+    else:
+        item_list = []; seen = set()
+        for link_tag, title_tag in zip(links, titles):
+            entry = normalize_item(link_tag, title_tag, text_of, params, base_url)
+            if entry is None or entry[0] in seen: continue
+            seen.add(entry[0])
+            item_list.append(entry[1])
+    record_stage("extract", time.perf_counter() - extract_started)
+        
+    return {"status": 200, "title": page_title, "items": item_list, "engine": engine}
+
+def extract_feeds(html: str, params_list: List[dict], base_url: str) -> List[dict]:
+    """同一页面上的多组规则：页面只解析一次，各组规则共用解析结果（在解析池中执行）"""
+    page: dict = {}
+    return [extract_feed(html, params, base_url, page=page) for params in params_list]
+
+def render_feed(title: str, url: str, item_list: List[dict], dates: List[float]) -> dict:
+    """生成 RSS 分段及其 ETag（在解析池中执行）"""
+    # 条目分段保存，响应时按 limit/offset/since 取片后拼接，无需重新生成
+    with stage("render"):
+        chunks = list(iter_rss(title, url, "", item_list, dates))
+    # ETag 只取决于频道标题与条目，重建时 lastBuildDate 的变化不影响它
+    digest = hashlib.sha1(json.dumps([title, url, item_list], ensure_ascii=False).encode()).hexdigest()
+    return {"chunks": chunks, "etag": f'W/"{digest}"'}
+
+async def build_feed(params: dict, base_url: str) -> dict:
+    """抓取页面，在解析池中提取条目，按历史记录补齐首次出现时间后生成 RSS"""
+    html = await fetch_html_raw(params['url'], charset=params['charset'], until=params.get('until'))
+    host = urllib.parse.urlparse(params['url']).netloc
+    feed = await run_in_pool(extract_feed, html, params, base_url, host=host)
+    return await finish_feed(params, feed, host)
+
+async def finish_feed(params: dict, feed: dict, host: str) -> dict:
+    """由提取结果补齐首次出现时间并生成 RSS 分段"""
+    if feed['status'] != 200: raise HTTPException(status_code=feed['status'], detail=feed['detail'])
+    STATS[f"feed_engine_{feed['engine']}"] += 1
+    dates = await item_history.first_seen(history_key(params), [get_short_id(item['link']) for item in feed['items']])
+    result = await run_in_pool(render_feed, feed['title'], params['url'], feed['items'], dates, host=host)
+    return {"chunks": result['chunks'], "etag": result['etag'], "dates": dates, "built_at": time.time()}
+
+def shared_feed_key(feed_key: str) -> str:
+    return "feed:" + hashlib.sha1(feed_key.encode()).hexdigest()
+
+async def load_feed(feed_key: str) -> Optional[dict]:
+    """取已生成的 feed：进程内缓存优先，本地副本缺失或已过新鲜期时再看共享缓存里有没有其他 worker 更新的结果"""
+    feed = feed_cache.get(feed_key)
+    if shared_store is None or (feed and time.time() - feed['built_at'] < FEED_CACHE_TTL): return feed
+    data = await shared_get(shared_feed_key(feed_key))
+    if not data: return feed
+    shared = json.loads(data)
+    if feed and feed['built_at'] >= shared['built_at']: return feed
+    shared['chunks'] = [chunk.encode('utf-8') for chunk in shared['chunks']]
+    count("feed_cache_shared_loads")
+    feed_cache.set(feed_key, shared, sum(map(len, shared['chunks'])))
+    return shared
+
+async def store_feed(feed_key: str, feed: dict):
+    feed_cache.set(feed_key, feed, sum(map(len, feed['chunks'])))
+    if shared_store is not None:
+        data = json.dumps({**feed, "chunks": [chunk.decode('utf-8') for chunk in feed['chunks']]}, ensure_ascii=False)
+        await shared_set(shared_feed_key(feed_key), data.encode(), FEED_REFRESH_MAX + FEED_CACHE_TTL)
+
+async def refresh_feed(feed_key: str, params: dict, base_url: str, max_age: Optional[float] = None) -> dict:
+    # max_age：等锁期间其他 worker 已在此时间内重建过时直接沿用
+    if max_age is not None:
+        feed = await load_feed(feed_key)
+        if feed and time.time() - feed['built_at'] < max_age: return feed
+    try:
+        feed = await build_feed(params, base_url)
+    except HTTPException: raise
+    except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+    await store_feed(feed_key, feed)
+    return feed
+
+def feed_cache_key(params: dict, base_url: str) -> str:
+    return json.dumps([base_url, params], sort_keys=True, ensure_ascii=False)
+
+def _param_bool(value) -> bool:
+    # p 中的表单值可能是字符串（"true"/"1"/"on"），与查询串解析出的 bool 归一，保证同一 feed 只有一个缓存键
+    if isinstance(value, str): return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+def _param_season(value) -> Optional[int]:
+    if value is None or value == "": return None
+    try: return int(value)
+    except (TypeError, ValueError): raise HTTPException(status_code=400, detail="season must be an integer")
+
+def parse_feed_params(raw: dict) -> dict:
+    """把查询参数或 p（见 decode_params）规范化为 feed 参数集，同时校验必填项与验证码"""
+    if raw.get('p'):
+        try:
+            decoded = decode_params(raw['p'])
+        except: raise HTTPException(status_code=400, detail="Parameter decoding failed")
+        raw = {**decoded, "season": decoded.get('season', raw.get('season'))}
+
+    url, a, code = raw.get('url'), raw.get('a'), raw.get('code')
+    if not all([url, a, code]): raise HTTPException(status_code=400, detail="Missing essential params")
+    if code != VERIFICATION_CODE: raise HTTPException(status_code=403)
+
+    params = {
+        "url": url, "a": a, "code": code, "t": raw.get('t') or None, "attr": raw.get('attr') or None,
+        "ts": raw.get('ts') or 'a', "as": raw.get('as') or 'a', "charset": (raw.get('charset') or "auto").lower(),
+        "clean": _param_bool(raw.get('clean', False)), "season": _param_season(raw.get('season')),
+        "novel": _param_bool(raw.get('novel', False)),
+    }
+    # until：页面中出现该标记（如列表区域的结束标签）后即停止下载，只在设置时加入参数，不影响已有 feed 的键
+    if raw.get('until'): params["until"] = raw['until']
+    return params
+
+class FeedScheduler:
+    """后台预取：登记被请求过的 feed，按自适应间隔在后台刷新缓存"""
+    def __init__(self):
+        self._feeds: Dict[str, dict] = {}
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def __contains__(self, feed_key: str) -> bool:
+        return feed_key in self._feeds
+
+    def register(self, feed_key: str, params: dict, base_url: str, etag: str):
+        now = time.time()
+        entry = self._feeds.get(feed_key)
+        if entry is None:
+            entry = self._feeds[feed_key] = {
+                "params": params, "base_url": base_url, "etag": etag,
+                "interval": FEED_REFRESH_MIN, "next_run": now + FEED_REFRESH_MIN * random.uniform(0.9, 1.1),
+            }
+            STATS["scheduler_registered"] += 1
+        entry['last_requested'] = now
+
+    async def _refresh(self, feed_key: str, entry: dict):
+        async with self._sem:
+            try:
+                # 多个 worker 都登记了同一个 feed 时，半个间隔内已被别人刷新过的直接沿用
+                feed = await feed_flight.do(feed_key, refresh_feed, feed_key, entry['params'], entry['base_url'],
+                                            entry['interval'] / 2)
+                changed = feed['etag'] != entry['etag']
+                entry['etag'] = feed['etag']
+                STATS["scheduler_refreshes"] += 1
+            except Exception:
+                changed = False
+                STATS["scheduler_errors"] += 1
+            finally:
+                self._running.pop(feed_key, None)
+        # 内容有变化的 feed 加快轮询，长期不变的逐步退避
+        interval = entry['interval'] / 2 if changed else entry['interval'] * 1.5
+        entry['interval'] = min(max(interval, FEED_REFRESH_MIN), FEED_REFRESH_MAX)
+        entry['next_run'] = time.time() + entry['interval'] * random.uniform(0.9, 1.1)
+
+    async def run(self):
+        self._sem = asyncio.Semaphore(FEED_REFRESH_CONCURRENCY)
+        while True:
+            now = time.time()
+            for feed_key, entry in list(self._feeds.items()):
+                if now - entry['last_requested'] > FEED_IDLE_EXPIRE:
+                    # 长时间无人订阅，停止刷新
+                    del self._feeds[feed_key]
+                elif entry['next_run'] <= now and feed_key not in self._running:
+                    self._running[feed_key] = asyncio.create_task(self._refresh(feed_key, entry))
+            await asyncio.sleep(1)
+
+feed_scheduler = FeedScheduler()
+
+class JobQueue:
+    """后台任务队列：相同键的任务合并为一个，排队数有上限，由固定数量的 worker 依次执行；
+    配置了共享后端时任务状态同步写入，其他 worker 也能查询"""
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.jobs: Dict[str, dict] = {}
+        self.running = 0
+        self._by_key: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self):
+        self._queue = asyncio.Queue(max(self.max_queued, 1))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(self.workers, 1))]
+
+    def stop(self):
+        for task in self._tasks: task.cancel()
+        self._tasks = []
+        self._queue = None
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.get('finished_at') and now - job['finished_at'] > JOB_TTL:
+                del self.jobs[job_id]
+                if self._by_key.get(job['key']) == job_id: del self._by_key[job['key']]
+
+    @staticmethod
+    def view(job: dict) -> dict:
+        """对外可见的任务状态（不含键与结果）"""
+        return {k: v for k, v in job.items() if not k.startswith('_') and k != 'key'}
+
+    async def _publish(self, job: dict):
+        if shared_store is not None:
+            data = {k: v for k, v in job.items() if not k.startswith('_')}
+            await shared_set("job:" + job['id'], json.dumps(data, ensure_ascii=False).encode(), JOB_TTL)
+
+    async def submit(self, kind: str, key: str, fn, *args) -> dict:
+        """登记任务；同键任务尚未完成时直接返回它，队列已满时返回 503"""
+        self._expire()
+        job_id = self._by_key.get(key)
+        if job_id and self.jobs[job_id]['status'] in ("queued", "running"):
+            count("jobs_coalesced")
+            return self.jobs[job_id]
+        if self._queue is None: self.start()
+        job = {"id": os.urandom(8).hex(), "kind": kind, "key": key, "status": "queued", "created_at": time.time(),
+               "_done": asyncio.Event()}
+        try:
+            self._queue.put_nowait((job, fn, args))
+        except asyncio.QueueFull:
+            count("jobs_rejected")
+            raise HTTPException(status_code=503, detail="Job queue is full", headers={"Retry-After": "10"})
+        self.jobs[job['id']] = job
+        self._by_key[key] = job['id']
+        count("jobs_submitted")
+        await self._publish(job)
+        return job
+
+    async def wait(self, job: dict, timeout: float) -> dict:
+        """最多等待 timeout 秒，返回任务（状态可能仍未完成）"""
+        if timeout > 0:
+            try: await asyncio.wait_for(asyncio.shield(job['_done'].wait()), timeout)
+            except asyncio.TimeoutError: pass
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        self._expire()
+        job = self.jobs.get(job_id)
+        if job is None:
+            data = await shared_get("job:" + job_id)
+            if data: job = json.loads(data)
+        return job
+
+    async def _worker(self):
+        while True:
+            # 每次取任务前清理过期任务；空闲时也按 JOB_TTL 醒来清理，已完成任务的结果不会一直留在内存里
+            self._expire()
+            try: job, fn, args = await asyncio.wait_for(self._queue.get(), JOB_TTL)
+            except asyncio.TimeoutError: continue
+            job['status'], job['started_at'] = "running", time.time()
+            METRICS.observe("job_wait_seconds", job['started_at'] - job['created_at'], kind=job['kind'])
+            self.running += 1
+            await self._publish(job)
+            try:
+                job['_result'] = await fn(*args)
+                job['status'] = "done"
+            except HTTPException as e:
+                job.update(status="failed", error=str(e.detail), error_status=e.status_code)
+            except Exception as e:
+                job.update(status="failed", error=str(e), error_status=500)
+            finally:
+                self.running -= 1
+                job['finished_at'] = time.time()
+                job['_done'].set()
+            METRICS.observe("job_run_seconds", job['finished_at'] - job['started_at'], kind=job['kind'])
+            count(f"jobs_{job['status']}")
+            await self._publish(job)
+
+job_queue = JobQueue(JOB_WORKERS, JOB_QUEUE_MAX)
+
+def job_headers(job: dict, code: str) -> dict:
+    return {"X-Job-Id": job['id'], "Location": f"/jobs/{job['id']}?code={code}", "Retry-After": "5"}
+
+def job_accepted(job: dict, code: str) -> Response:
+    """任务尚未完成：返回 202 与任务状态，客户端轮询 Location 或稍后重试原请求"""
+    body = json.dumps({**JobQueue.view(job), "result": f"/jobs/{job['id']}/result?code={code}"}, ensure_ascii=False)
+    return Response(body, status_code=202, media_type="application/json", headers=job_headers(job, code))
+
+# 返回旧结果时的标记（RFC 7234 Warning 110）
+STALE_HEADERS = {"Warning": '110 - "Response is Stale"', "X-Stale": "1"}
 
 @app.get("/html2rss")
 async def html2rss(
@@ -490,130 +2313,296 @@ async def html2rss(
     charset: str="auto",
     clean: bool=False,
     season: Optional[int]=None,
-    novel: bool=False
+    novel: bool=False,
+    until: Optional[str]=None,
+    limit: Optional[int]=None,
+    offset: int=0,
+    since: Optional[float]=None,
+    job: bool=False
 ):
-    if p:
-        try:
-            num = decode_base62(p)
-            byte_len = (num.bit_length() + 7) // 8
-            params = json.loads(num.to_bytes(byte_len, 'big').decode('utf-8'))
-            url = params.get('url')
-            a = params.get('a')
-            code = params.get('code')
-            t = params.get('t')
-            attr = params.get('attr')
-            ts = params.get('ts', 'a')
-            as_ = params.get('as', 'a')
-            charset = params.get('charset', 'auto')
-            clean = params.get('clean', False)
-            season = params.get('season', season)
-            novel = params.get('novel', False)
-        except: raise HTTPException(status_code=400, detail="Parameter decoding failed")
-    
-    if not all([url, a, code]): raise HTTPException(status_code=400, detail="Missing essential params")
+    params = parse_feed_params({
+        "p": p, "url": url, "a": a, "code": code, "t": t, "attr": attr, "ts": ts, "as": as_,
+        "charset": charset, "clean": clean, "season": season, "novel": novel, "until": until,
+    })
+    base_url = str(request.base_url).rstrip('/')
+    feed_key = feed_cache_key(params, base_url)
+
+    feed = await load_feed(feed_key)
+    age = time.time() - feed['built_at'] if feed else None
+    stale_headers = {}
+    if feed and age < FEED_CACHE_TTL:
+        count("feed_cache_hits")
+    elif feed and feed_key in feed_scheduler and age < FEED_REFRESH_MAX + FEED_CACHE_TTL:
+        # 已由后台调度器负责刷新，直接返回最近一次的结果
+        count("feed_cache_scheduled_hits")
+    elif job:
+        # 异步模式：在后台队列中构建，有旧结果时先返回旧结果，否则返回 202
+        count("feed_cache_misses")
+        queued = await job_queue.submit("feed", feed_key, feed_flight.do, feed_key, refresh_feed, feed_key, params, base_url, FEED_CACHE_TTL)
+        if feed:
+            count("feed_stale_served")
+            stale_headers = {**STALE_HEADERS, "X-Job-Id": queued['id']}
+        else:
+            queued = await job_queue.wait(queued, JOB_WAIT)
+            if queued['status'] == "failed": raise HTTPException(status_code=queued['error_status'], detail=queued['error'])
+            if queued['status'] != "done": return job_accepted(queued, params['code'])
+            feed = queued['_result']
+    else:
+        count("feed_cache_misses")
+        feed = await feed_flight.do(feed_key, refresh_feed, feed_key, params, base_url, FEED_CACHE_TTL)
+    if FEED_SCHEDULER_ENABLED:
+        feed_scheduler.register(feed_key, params, base_url, feed['etag'])
+
+    chunks, etag = feed['chunks'], feed['etag']
+    if since is not None or limit is not None or offset:
+        # chunks[0] 为频道头，chunks[-1] 为结尾，中间与 dates 一一对应
+        items = chunks[1:-1]
+        if since is not None:
+            # 增量：只返回 since（Unix 时间戳）之后首次出现的条目
+            items = [c for c, d in zip(items, feed['dates']) if d > since]
+        start = max(offset, 0)
+        stop = None if limit is None else start + max(limit, 0)
+        chunks = [chunks[0], *items[start:stop], chunks[-1]]
+        etag = f'{etag[:-1]}-{offset}-{limit}-{since}"'
+
+    headers = {"ETag": etag, **stale_headers}
+    if etag_matches(request, etag):
+        STATS["feed_not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    # 分段都已在内存中，一次拼接后整体发送；逐段流式输出每段都要经过线程池与一次 ASGI send
+    return Response(b"".join(chunks), media_type="application/xml; charset=utf-8", headers=headers)
+
+def feed_query(params: dict) -> str:
+    """规范化参数对应的 /html2rss 查询串，用于批量结果中的订阅地址"""
+    query = {}
+    for key, value in params.items():
+        if value is None: continue
+        query["as_" if key == "as" else key] = str(value).lower() if isinstance(value, bool) else value
+    return urllib.parse.urlencode(query)
+
+def batch_line(index: int, status: int, **fields) -> bytes:
+    return (json.dumps({"index": index, "status": status, **fields}, ensure_ascii=False) + "\n").encode('utf-8')
+
+@app.post("/html2rss/batch")
+async def html2rss_batch(request: Request, code: str, feeds: List[Union[str, dict]] = Body(...), mode: str = "ndjson"):
+    """批量生成 feed：feeds 为参数集（JSON 对象）或 p 字符串的列表。
+    相同页面只抓取、解析一次，各组规则共用解析结果；结果写入 feed 缓存并登记后台刷新。
+    mode=ndjson 按完成顺序逐行返回 RSS，mode=store 只返回各 feed 的订阅地址，之后用 GET 读取缓存
+    """
     if code != VERIFICATION_CODE: raise HTTPException(status_code=403)
-    
-    try:
-        html, _ = await fetch_html_raw(url, charset=charset)
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # 支持逗号分隔的多选择器
-        all_a_selectors = [sel.strip() for sel in a.split(',')]
-        links = []
-        for sel in all_a_selectors:
-            links.extend(soup.select(sel))
-            
-        if not links: raise HTTPException(status_code=400, detail="No links found")
-        
-        titles = []
-        if t:
-            all_t_selectors = [sel.strip() for sel in t.split(',')]
-            for sel in all_t_selectors:
-                titles.extend(soup.select(sel))
-        
-        if not titles or len(titles) != len(links): titles = links
+    if mode not in ("ndjson", "store"): raise HTTPException(status_code=400, detail="mode must be ndjson or store")
+    if len(feeds) > BATCH_MAX_FEEDS: raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_FEEDS} feeds per batch")
+    base_url = str(request.base_url).rstrip('/')
 
-        # Basic Sorting
-        if as_ == 'd': links = links[::-1]
-        if ts == 'd': titles = titles[::-1]
+    def result_line(index: int, params: dict, feed: dict) -> bytes:
+        if mode == "store":
+            return batch_line(index, 200, etag=feed['etag'], items=len(feed['dates']),
+                              feed=f"{base_url}/html2rss?{feed_query(params)}")
+        return batch_line(index, 200, etag=feed['etag'], rss=b"".join(feed['chunks']).decode('utf-8'))
 
-        item_list = []; seen = set(); base_url = str(request.base_url).rstrip('/')
-        for link_tag, title_tag in zip(links, titles):
-            # 容错：尝试多个可能的属性
-            raw_href = None
-            for attr_name in [attr or "href", "data-href", "data-url", "original-href"]:
-                raw_href = link_tag.get(attr_name)
-                if raw_href: break
-            
-            if not raw_href: continue
-            
+    # 按 (url, charset, until) 分组，同一页面的规则一起处理；缓存仍新鲜的直接返回
+    ready: List[bytes] = []
+    pages: Dict[tuple, List[Tuple[int, dict, str]]] = {}
+    for index, raw in enumerate(feeds):
+        try:
+            params = parse_feed_params({"p": raw} if isinstance(raw, str) else {"code": code, **raw})
+        except HTTPException as e:
+            ready.append(batch_line(index, e.status_code, detail=e.detail))
+            continue
+        feed_key = feed_cache_key(params, base_url)
+        feed = await load_feed(feed_key)
+        if feed and time.time() - feed['built_at'] < FEED_CACHE_TTL:
+            count("feed_cache_hits")
+            ready.append(result_line(index, params, feed))
+            continue
+        pages.setdefault((params['url'], params['charset'], params.get('until')), []).append((index, params, feed_key))
+    STATS["batch_feeds"] += len(feeds)
+    STATS["batch_pages"] += len(pages)
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+    async def build_page(page_key: tuple, members: List[Tuple[int, dict, str]]) -> List[bytes]:
+        url, charset, until = page_key
+        host = urllib.parse.urlparse(url).netloc
+        async with sem:
             try:
-                # 彻底清洗 URL 中的首尾空格及中间的换行
-                l_url = urllib.parse.urljoin(url, raw_href.strip())
-                l_url = re.sub(r'[\r\n\t]+', '', l_url)
-            except Exception:
+                html = await fetch_html_raw(url, charset=charset, until=until)
+                extracted = await run_in_pool(extract_feeds, html, [m[1] for m in members], base_url, host=host)
+            except HTTPException as e:
+                return [batch_line(index, e.status_code, detail=e.detail) for index, _, _ in members]
+            except Exception as e:
+                return [batch_line(index, 500, detail=str(e)) for index, _, _ in members]
+        lines = []
+        for (index, params, feed_key), extracted_feed in zip(members, extracted):
+            try:
+                feed = await finish_feed(params, extracted_feed, host)
+            except HTTPException as e:
+                lines.append(batch_line(index, e.status_code, detail=e.detail))
                 continue
-            
-            if l_url in seen: continue
-            
-            # 容错：标题提取逻辑增强
-            title = title_tag.get_text(strip=True)
-            if not title:
-                title = title_tag.get("title") or title_tag.get("alt") or "无标题"
-            
-            # 小说模式过滤与去空格
-            if novel:
-                # 匹配“第xx章/节/回/集/话/卷”或“Chapter xx”或“数字. ”开头等模式
-                if not re.search(r'第.*?[章节节回集话卷]|Chapter\s*\d+|^\d+[\s\.]+', title, re.I):
-                    continue
-                # 小说模式下先去除标题中的各种空白字符
-                title = re.sub(r'[\s\u3000\xa0]+', '', title)
-                # 在章节关键字（第...章/节/回/集/话/卷）后面加一个空格，增加可读性
-                title = re.sub(r'(第.*?[章节节回集话卷])', r'\1 ', title)
-                # 处理 Chapter 格式
-                title = re.sub(r'(Chapter\d+)', r'\1 ', title, flags=re.I)
-                title = title.strip()
-
-            seen.add(l_url)
-            
-            if l_url.startswith("magnet:"): 
-                dn = extract_magnet_dn(l_url)
-                if dn: title = dn
-            
-            if season is not None:
-                title = format_episode_title(title, int(season))
-            
-            if clean and not l_url.startswith("magnet:"):
-                l_url = f"{base_url}/read?url={url_encode_proxy(l_url)}&code={code}"
-            
-            item_list.append({"title": title, "link": l_url})
-        
-        if novel:
-            # 小说模式下，按照章节标题进行自然排序（降序，即最新章节在前）
-            item_list.sort(key=lambda x: natural_sort_key(x['title']), reverse=True)
-            
-        rss_content = await generate_rss(soup.title.string if soup.title else url, url, "", item_list)
-        return Response(content=rss_content.encode('utf-8'), media_type="application/xml; charset=utf-8")
-    except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+            except Exception as e:
+                lines.append(batch_line(index, 500, detail=str(e)))
+                continue
+            count("feed_cache_misses")
+            await store_feed(feed_key, feed)
+            if FEED_SCHEDULER_ENABLED:
+                feed_scheduler.register(feed_key, params, base_url, feed['etag'])
+            lines.append(result_line(index, params, feed))
+        return lines
+
+    async def stream():
+        for line in ready: yield line
+        tasks = [asyncio.ensure_future(build_page(page_key, members)) for page_key, members in pages.items()]
+        try:
+            for task in asyncio.as_completed(tasks):
+                for line in await task: yield line
+        finally:
+            # 客户端中途断开时不再继续抓取
+            for task in tasks: task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, code: str):
+    if code != VERIFICATION_CODE: raise HTTPException(status_code=403)
+    job = await job_queue.get(job_id)
+    if job is None: raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return {**JobQueue.view(job), "result": f"/jobs/{job_id}/result?code={code}"}
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(request: Request, job_id: str, code: str):
+    """任务结果：feed 返回 RSS，阅读页返回 HTML；未完成时返回 202，失败时返回原错误"""
+    if code != VERIFICATION_CODE: raise HTTPException(status_code=403)
+    job = await job_queue.get(job_id)
+    if job is None: raise HTTPException(status_code=404, detail="Unknown or expired job")
+    if job['status'] == "failed": raise HTTPException(status_code=job['error_status'], detail=job['error'])
+    if job['status'] != "done": return job_accepted(job, code)
+    # 任务可能在其他 worker 上完成：feed 从（共享）缓存读取，阅读页按需重建（上游页面已在缓存中）
+    result = job.get('_result')
+    if job['kind'] == "feed":
+        feed = result or await load_feed(job['key'])
+        if feed is None: raise HTTPException(status_code=404, detail="Result expired")
+        if etag_matches(request, feed['etag']): return Response(status_code=304, headers={"ETag": feed['etag']})
+        return Response(b"".join(feed['chunks']), media_type="application/xml; charset=utf-8", headers={"ETag": feed['etag']})
+    chapter = result or reader_cache.get(job['key']) or await read_flight.do(job['key'], build_chapter, job['key'])
+    return HTMLResponse(content=render_reader(chapter, code))
+
+@app.get("/stats")
+async def stats(code: str):
+    if code != VERIFICATION_CODE: raise HTTPException(status_code=403)
+    return {**STATS, "hosts": {host: limiter.snapshot() for host, limiter in _host_limiters.items()},
+            "jobs": {"queued": job_queue.depth, "running": job_queue.running, "tracked": len(job_queue.jobs)}}
+
+@app.get("/metrics")
+async def metrics(code: str):
+    if code != VERIFICATION_CODE: raise HTTPException(status_code=403)
+    gauges = {("parse_pending", ()): _parse_pending, ("job_queue_depth", ()): job_queue.depth,
+              ("job_running", ()): job_queue.running}
+    for host, limiter in _host_limiters.items():
+        gauges[("host_active", (("host", host),))] = limiter.active
+        gauges[("host_queued", (("host", host),))] = limiter.queued
+    return Response(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def read_index(): return FileResponse('webroot/index.html')
 app.mount("/", StaticFiles(directory="webroot"), name="static")
 
-if __name__ == "__main__":
+_WARMUP_PAGE = """<html><head><meta charset="utf-8"><title>预热</title></head><body>
+<div class="listmain"><dl><dd><a href="/1/1.html">第1章 开始</a></dd><dd><a href="/1/2.html">第2章 继续</a></dd></dl></div>
+<div id="content">第一段正文。<br>第二段正文。<br><a href="/1/1_2.html">下一页</a></div>
+<a href="/1/2.html">下一章</a><a href="/1/">目录</a>
+<table><tr><td class="name"><a href="magnet:?xt=urn:btih:0&amp;dn=Show.01.1080p.mkv">Show 01 1080p</a></td></tr></table>
+</body></html>"""
+_warmed = False
+
+def warmup():
+    """启动预热：WARMUP=1 时在 lifespan 中执行，多进程模式下总是在 fork 之前执行；第一个真实请求不再承担导入依赖、编译正则与选择器的开销"""
+    global _warmed
+    if _warmed: return
+    started = time.perf_counter()
+    url = "http://warmup.invalid/1/"
+    novel = parse_feed_params({"url": url, "a": ".listmain dd a", "code": VERIFICATION_CODE, "novel": True})
+    magnet = parse_feed_params({"url": url, "a": "td.name a", "t": "td.name a", "code": VERIFICATION_CODE, "season": 1})
+    for params in (novel, magnet):
+        for engine in ("lxml", "bs4"):
+            feed = extract_feed(_WARMUP_PAGE, params, "", engine=engine)
+            render_feed(feed['title'], url, feed['items'], [time.time()] * len(feed['items']))
+    page = extract_read_page(_WARMUP_PAGE, url + "1.html")
+    process_pure_content(page['text'])
+    detect_from_html(_WARMUP_PAGE, url)
+    detect_from_html(_WARMUP_PAGE.split("<table>")[0], url)
+    sniff_charset("第1章 开始，第2章 继续。".encode("gb18030") * 8)
+    for sel in split_selectors(WARMUP_SELECTORS):
+        try:
+            compile_css(sel)
+            compile_soup_css(sel)
+        except Exception: pass
+    # 预热产生的计数不计入运行统计
+    STATS.clear()
+    METRICS.counters.clear()
+    METRICS.histograms.clear()
+    STATS["warmup_ms"] = int((time.perf_counter() - started) * 1000)
+    _warmed = True
 
+def serve_workers(host: str, port: int, workers: int):
+    """多进程模式：父进程先预热（导入解析依赖、编译选择器与正则），绑定端口后 fork 出各 worker 共用同一个监听 socket；
+    worker 异常退出时补上，收到 SIGTERM/SIGINT 时通知所有 worker 退出"""
+    global shared_store
     import uvicorn
+    os.environ.setdefault("SHARED_CACHE", "sqlite:///data/shared.db")
+    if shared_store is None: shared_store = open_shared_store(os.environ["SHARED_CACHE"])
+    if not hasattr(os, "fork"):
+        # 不支持 fork 的平台交给 uvicorn 启动子进程，各自重新导入应用
+        uvicorn.run("main:app", host=host, port=port, workers=workers)
+        return
+    # 不论 WARMUP 取值都在 fork 前预热，各 worker 继承已导入的依赖与编译结果，启动即是热的
+    warmup()
 
-    import argparse
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    children = set()
+    stopping = False
 
-    
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # 连接、解析池与调度器都在各 worker 的 lifespan 中创建
+            uvicorn.Server(uvicorn.Config(app)).run(sockets=[sock])
+            os._exit(0)
+        children.add(pid)
 
-    parser = argparse.ArgumentParser()
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try: os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError: pass
 
-    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 3000)))
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers): spawn()
+    while children:
+        try: pid, _ = os.wait()
+        except ChildProcessError: break
+        children.discard(pid)
+        if not stopping:
+            time.sleep(1)  # 避免启动即崩溃时反复 fork
+            if not stopping: spawn()
+    sock.close()
 
-    args = parser.parse_args()
+if __name__ == "__main__":
+    import uvicorn
+    import argparse
 
-    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 3000)))
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
 
-    uvicorn.run(app, host="0.0.0.0", port=args.port)
+    if args.workers > 1:
+        serve_workers("0.0.0.0", args.port, args.workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=args.port)